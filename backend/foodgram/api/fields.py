@@ -0,0 +1,136 @@
+import binascii
+import uuid
+from base64 import b64decode
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models.fields.files import FieldFile
+from PIL import Image
+from rest_framework import serializers
+
+EXTENSIONS = {'JPEG': 'jpg'}
+BASE64_CHUNK_SIZE = 64 * 1024
+# Во сколько раз строка base64 может быть длиннее данных без пробелов.
+BASE64_WHITESPACE_ALLOWANCE = 1.1
+
+
+class ImageBase64Field(serializers.ImageField):
+    """Изображение в виде data URI или обычного файла.
+
+    data URI декодируется кусками в SpooledTemporaryFile: до
+    FILE_UPLOAD_MAX_MEMORY_SIZE в памяти, дальше на диске. Размер
+    проверяется по длине строки до декодирования и по числу уже
+    декодированных байт, число пикселей — по заголовку до того, как
+    Pillow распакует картинку. Проверка Pillow читает файл напрямую,
+    без копии в BytesIO, как у forms.ImageField.
+
+    Расширение берётся из формата, который определил Pillow, а не из
+    заголовка data URI. Если задан variant, в ответ отдаётся ссылка на
+    подготовленный вариант из JSON-поля variants_field, пока он
+    относится к текущему файлу, иначе — на оригинал.
+    """
+
+    default_error_messages = {
+        'too_large': 'Размер изображения не должен превышать {max_size} МБ.',
+        'too_many_pixels': (
+            'Изображение не должно содержать больше {max_pixels} пикселей.'
+        ),
+    }
+
+    def __init__(self, *args, file_prefix='image', variant=None,
+                 variants_field=None, **kwargs):
+        self.file_prefix = file_prefix
+        self.variant = variant
+        self.variants_field = variants_field
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith('data:image'):
+            data = self.decode(data)
+        elif getattr(data, 'size', 0) > settings.IMAGE_MAX_UPLOAD_SIZE:
+            self.fail_too_large()
+        image_file = serializers.FileField.to_internal_value(self, data)
+        image_format = self.inspect(image_file)
+        extension = EXTENSIONS.get(image_format, image_format.lower())
+        image_file.name = (
+            f'{self.file_prefix}_{uuid.uuid4().hex[:10]}.{extension}'
+        )
+        return image_file
+
+    def decode(self, data):
+        start = data.find(';base64,')
+        if start == -1:
+            self.fail('invalid_image')
+        start += len(';base64,')
+        # Base64 с переносами строк (по 76 символов) допустим: на пробельные
+        # символы отводится запас, всё длиннее отбрасывается без копий.
+        max_encoded = -(-settings.IMAGE_MAX_UPLOAD_SIZE // 3) * 4
+        if len(data) - start > max_encoded * BASE64_WHITESPACE_ALLOWANCE:
+            self.fail_too_large()
+
+        buffer = SpooledTemporaryFile(settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        try:
+            self.decode_chunks(data, start, buffer)
+        except BaseException:
+            buffer.close()
+            raise
+        buffer.seek(0)
+        return File(buffer, name=self.file_prefix)
+
+    def decode_chunks(self, data, start, buffer):
+        """Пишет в buffer base64 из data[start:] кусками без пробелов.
+
+        Остаток куска, не кратный 4, переносится в следующий, чтобы
+        каждый b64decode получал целые группы символов.
+        """
+        size = 0
+        carry = ''
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+                chunk = carry + ''.join(
+                    data[offset:offset + BASE64_CHUNK_SIZE].split()
+                )
+                aligned = len(chunk) - len(chunk) % 4
+                chunk, carry = chunk[:aligned], chunk[aligned:]
+                size += buffer.write(b64decode(chunk, validate=True))
+                if size > settings.IMAGE_MAX_UPLOAD_SIZE:
+                    self.fail_too_large()
+        except (ValueError, binascii.Error):
+            self.fail('invalid_image')
+        if carry:
+            self.fail('invalid_image')
+
+    def inspect(self, image_file):
+        width = height = 0
+        try:
+            with Image.open(image_file) as image:
+                width, height = image.size
+                image_format = image.format
+                if width * height <= settings.IMAGE_MAX_PIXELS:
+                    image.verify()
+        except Image.DecompressionBombError:
+            width = height = settings.IMAGE_MAX_PIXELS
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            image_file.seek(0)
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            self.fail('too_many_pixels', max_pixels=settings.IMAGE_MAX_PIXELS)
+        return image_format
+
+    def fail_too_large(self):
+        self.fail(
+            'too_large',
+            max_size=settings.IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)
+        )
+
+    def to_representation(self, value):
+        if self.variant and value:
+            variants = getattr(value.instance, self.variants_field) or {}
+            if (variants.get('source') == value.name
+                    and self.variant in variants):
+                value = FieldFile(
+                    value.instance, value.field, variants[self.variant]
+                )
+        return super().to_representation(value)
@@ -0,0 +1,69 @@
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .tasks import task_queue
+
+# Отправляется после сохранения вариантов: sender — модель, pk — объект.
+variants_ready = Signal()
+
+
+def schedule_variants(instance, field_name, variants_field):
+    image = getattr(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    if image and variants.get('source') != image.name:
+        task_queue.enqueue(
+            build_variants, instance._meta.label, instance.pk,
+            field_name, variants_field
+        )
+
+
+def build_variants(model_label, pk, field_name, variants_field):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).only(
+        field_name, variants_field
+    ).first()
+    if instance is None:
+        return
+    image_file = getattr(instance, field_name)
+    old_variants = getattr(instance, variants_field) or {}
+    if not image_file or old_variants.get('source') == image_file.name:
+        return
+
+    with image_file.open('rb'):
+        image = Image.open(image_file)
+        image.load()
+    # exif_transpose поворачивает по EXIF; при сохранении в WebP
+    # метаданные оригинала не копируются.
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    source = PurePosixPath(image_file.name)
+    variants = {'source': image_file.name}
+    for name, size in settings.IMAGE_VARIANTS.items():
+        variant = image.copy()
+        variant.thumbnail(size, Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        variant.save(
+            buffer, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY, method=4
+        )
+        variants[name] = image_file.storage.save(
+            f'{source.parent}/variants/{source.stem}_{name}.webp',
+            ContentFile(buffer.getvalue())
+        )
+
+    updated = model.objects.filter(
+        pk=pk, **{field_name: image_file.name}
+    ).update(**{variants_field: variants, 'updated_at': timezone.now()})
+    stale = old_variants if updated else variants
+    for name, path in stale.items():
+        if name != 'source':
+            image_file.storage.delete(path)
+    if updated:
+        variants_ready.send(sender=model, pk=pk)
@@ -0,0 +1,58 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+    Histogram, generate_latest, multiprocess
+)
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds',
+    'Длительность обработки запроса',
+    ('view', 'action', 'method', 'status')
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'foodgram_requests_in_progress',
+    'Запросы в обработке',
+    multiprocess_mode='livesum'
+)
+DB_QUERIES = Counter(
+    'foodgram_db_queries_total',
+    'SQL-запросы',
+    ('alias',)
+)
+DB_QUERY_DURATION = Histogram(
+    'foodgram_db_query_duration_seconds',
+    'Длительность SQL-запросов',
+    ('alias',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+             0.5, 1, 2.5)
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кэшу ответов',
+    ('cache', 'result')
+)
+RECIPES_CREATED = Counter(
+    'foodgram_recipes_created_total',
+    'Созданные рецепты'
+)
+RECIPES_TOGGLED = Counter(
+    'foodgram_recipe_relations_toggled_total',
+    'Добавления и удаления рецептов в избранное и корзину',
+    ('relation', 'action')
+)
+SHOPPING_LISTS_DOWNLOADED = Counter(
+    'foodgram_shopping_lists_downloaded_total',
+    'Скачанные списки покупок',
+    ('format',)
+)
+
+
+def render_metrics():
+    """Текст метрик; при нескольких воркерах gunicorn — суммарно по всем."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
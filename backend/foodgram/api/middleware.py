@@ -0,0 +1,252 @@
+import json
+import logging
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+from .metrics import (
+    DB_QUERIES, DB_QUERY_DURATION, REQUEST_LATENCY, REQUESTS_IN_PROGRESS
+)
+
+logger = logging.getLogger('foodgram.profiling')
+
+HISTOGRAM_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+current_profile = ContextVar('current_profile', default=None)
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.render_started = None
+        self.render_time = 0.0
+        self.statements = {}
+        self.duplicate_stacks = {}
+
+    def record_query(self, sql, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        count = self.statements.get(sql, 0) + 1
+        self.statements[sql] = count
+        if count == settings.REQUEST_PROFILING_DUPLICATE_THRESHOLD:
+            self.duplicate_stacks[sql] = ''.join(traceback.format_list([
+                frame for frame in traceback.extract_stack()
+                if str(settings.BASE_DIR) in frame.filename
+                and __file__ != frame.filename
+            ][-5:]))
+
+    @property
+    def duplicates(self):
+        return {
+            sql: self.statements[sql] for sql in self.duplicate_stacks
+        }
+
+
+class RouteHistograms:
+    """Гистограммы длительности запросов по маршрутам в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, route, duration_ms, queries):
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                'count': 0,
+                'sum_ms': 0.0,
+                'queries': 0,
+                'buckets': [0] * len(HISTOGRAM_BUCKETS),
+            })
+            stats['count'] += 1
+            stats['sum_ms'] += duration_ms
+            stats['queries'] += queries
+            for index, bound in enumerate(HISTOGRAM_BUCKETS):
+                if duration_ms <= bound:
+                    stats['buckets'][index] += 1
+                    break
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                route: {
+                    'count': stats['count'],
+                    'avg_ms': round(stats['sum_ms'] / stats['count'], 2),
+                    'avg_queries': round(
+                        stats['queries'] / stats['count'], 2
+                    ),
+                    'buckets': {
+                        ('+Inf' if bound == float('inf') else str(bound)):
+                            count
+                        for bound, count in zip(
+                            HISTOGRAM_BUCKETS, stats['buckets']
+                        )
+                    },
+                }
+                for route, stats in sorted(self._routes.items())
+            }
+
+
+route_histograms = RouteHistograms()
+
+
+def query_timer(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile = current_profile.get()
+        if profile is not None:
+            profile.record_query(sql, time.perf_counter() - started)
+
+
+def instrument_serializers():
+    original = serializers.BaseSerializer.data
+    if getattr(original.fget, 'profiled', False):
+        return
+
+    def data(self):
+        profile = current_profile.get()
+        if profile is None:
+            return original.fget(self)
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_time += time.perf_counter() - started
+
+    data.profiled = True
+    serializers.BaseSerializer.data = property(data)
+
+
+class RequestProfilingMiddleware:
+    """Замеры SQL, сериализации и рендеринга для каждого запроса.
+
+    Включается переменной REQUEST_PROFILING. Итоги уходят в заголовок
+    Server-Timing, в лог foodgram.profiling одной JSON-строкой и в
+    гистограммы по маршрутам, доступные администратору
+    по /api/profiling/. Одинаковые SQL-запросы, повторённые не меньше
+    REQUEST_PROFILING_DUPLICATE_THRESHOLD раз, попадают в лог вместе
+    со стеком вызова — обычно это N+1.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrument_serializers()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        try:
+            with connections['default'].execute_wrapper(query_timer):
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        self.finish(request, response, profile)
+        return response
+
+    def process_template_response(self, request, response):
+        profile = current_profile.get()
+        profile.render_started = time.perf_counter()
+
+        def render_finished(response):
+            profile.render_time = time.perf_counter() - profile.render_started
+
+        response.add_post_render_callback(render_finished)
+        return response
+
+    @staticmethod
+    def finish(request, response, profile):
+        total = time.perf_counter() - profile.started
+        timings = {
+            'db': profile.db_time,
+            'serialize': profile.serializer_time,
+            'render': profile.render_time,
+            'total': total,
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={value * 1000:.1f}'
+            + (f';desc="{profile.queries} queries"' if name == 'db' else '')
+            for name, value in timings.items()
+        )
+
+        match = request.resolver_match
+        route = f'{request.method} {match.view_name if match else "unknown"}'
+        route_histograms.observe(route, total * 1000, profile.queries)
+        logger.info(json.dumps({
+            'route': route,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'queries': profile.queries,
+            **{
+                f'{name}_ms': round(value * 1000, 2)
+                for name, value in timings.items()
+            },
+        }))
+        for sql, count in profile.duplicates.items():
+            logger.warning(
+                'Запрос повторён %s раз за %s (возможен N+1): %s\n%s',
+                count, route, sql, profile.duplicate_stacks[sql]
+            )
+
+
+class MetricsMiddleware:
+    """Метрики Prometheus по запросам и SQL, отдаются по /api/metrics.
+
+    Вью подписывается классом и действием DRF (RecipeViewSet/list),
+    а не путём, чтобы id в URL не плодили отдельные ряды.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        request.metrics_view = ('unknown', '')
+        with REQUESTS_IN_PROGRESS.track_inprogress():
+            with connections['default'].execute_wrapper(
+                self.count_query
+            ):
+                response = self.get_response(request)
+        view, action = request.metrics_view
+        REQUEST_LATENCY.labels(
+            view, action, request.method, response.status_code
+        ).observe(time.perf_counter() - started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None) or {}
+        request.metrics_view = (
+            view_class.__name__ if view_class else view_func.__name__,
+            actions.get(request.method.lower(), '')
+        )
+
+    @staticmethod
+    def count_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            alias = context['connection'].alias
+            DB_QUERIES.labels(alias).inc()
+            DB_QUERY_DURATION.labels(alias).observe(
+                time.perf_counter() - started
+            )
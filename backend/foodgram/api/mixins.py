@@ -0,0 +1,92 @@
+import hashlib
+
+from django.db.models import Count, Max, Subquery
+from django.utils.cache import (
+    get_conditional_response, patch_vary_headers, quote_etag
+)
+from django.utils.http import http_date
+from rest_framework import status
+
+
+def get_relations_state(user, *relations):
+    """Число и последний id связей пользователя одним запросом.
+
+    relations — пары (модель, поле пользователя). Добавление связи меняет
+    последний id, удаление — число, поэтому пара годится в версию ответа.
+    """
+    if not user.is_authenticated:
+        return ()
+    model = type(user)
+    annotations = {}
+    for index, (relation_model, field) in enumerate(relations):
+        subquery = relation_model.objects.filter(
+            **{field: user}
+        ).values(field)
+        annotations[f'count_{index}'] = Subquery(subquery.annotate(
+            value=Count('pk')
+        ).values('value'))
+        annotations[f'last_{index}'] = Subquery(subquery.annotate(
+            value=Max('pk')
+        ).values('value'))
+    return model.objects.filter(pk=user.pk).annotate(
+        **annotations
+    ).values_list(*annotations).get()
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list и retrieve.
+
+    Наследник описывает состояние ресурса дешёвыми данными из БД
+    (временем изменения, счётчиками) в get_list_version и
+    get_object_version. Если клиент прислал совпадающий валидатор,
+    отвечаем 304 без выборки и сериализации самих объектов.
+    Last-Modified отдаётся только анонимам: для пользователя ответ
+    зависит ещё и от его избранного и подписок, а у них нет времени
+    изменения. Для списков его не передают вовсе: удаление записи
+    не двигает максимальное время изменения.
+    """
+
+    def get_list_version(self, request):
+        return None
+
+    def get_object_version(self, request):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, self.get_list_version, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, self.get_object_version, super().retrieve,
+            *args, **kwargs
+        )
+
+    def get_conditional_response(self, request, get_version, view_method,
+                                 *args, **kwargs):
+        version = get_version(request)
+        if version is None:
+            return view_method(request, *args, **kwargs)
+        state, last_modified = version
+
+        etag = quote_etag(hashlib.md5(repr((
+            request.get_full_path(), request.user.pk, state
+        )).encode()).hexdigest())
+        last_modified = (
+            int(last_modified.timestamp())
+            if last_modified and not request.user.is_authenticated
+            else None
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view_method(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
@@ -0,0 +1,53 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class TaskQueue:
+    """Фоновые задачи в пуле потоков текущего процесса.
+
+    Задача ставится после коммита транзакции, чтобы воркер видел
+    сохранённые данные. Брокера нет: задачи, не успевшие выполниться
+    до остановки процесса, теряются, поэтому всё, что ставится сюда,
+    должно быть идемпотентным и восстановимым командой. С
+    TASKS_ALWAYS_EAGER задачи выполняются сразу в текущем потоке.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    settings.TASK_WORKERS, thread_name_prefix='tasks'
+                )
+            return self._executor
+
+    def enqueue(self, func, *args):
+        if settings.TASKS_ALWAYS_EAGER:
+            transaction.on_commit(partial(func, *args))
+        else:
+            transaction.on_commit(
+                partial(self.executor.submit, self.run, func, *args)
+            )
+
+    @staticmethod
+    def run(func, *args):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Задача %s%r завершилась ошибкой', func, args)
+        finally:
+            connections.close_all()
+
+
+task_queue = TaskQueue()
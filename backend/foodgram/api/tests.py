@@ -0,0 +1,74 @@
+import os
+import tracemalloc
+from base64 import b64encode
+from io import BytesIO
+
+from django.test import Client, SimpleTestCase, override_settings
+from PIL import Image
+from rest_framework import serializers
+
+from api.fields import BASE64_CHUNK_SIZE, ImageBase64Field
+
+
+def make_png(size=(200, 200)):
+    # Шум не сжимается, так что base64 длиннее одного куска декодера.
+    output = BytesIO()
+    Image.frombytes(
+        'RGB', size, os.urandom(size[0] * size[1] * 3)
+    ).save(output, 'PNG')
+    return output.getvalue()
+
+
+@override_settings(IMAGE_MAX_UPLOAD_SIZE=1024 * 1024)
+class ImageBase64FieldTest(SimpleTestCase):
+    """Декодирование data URI: переносы строк и ограничение размера."""
+
+    def test_line_wrapped(self):
+        content = make_png()
+        self.assertGreater(len(content), BASE64_CHUNK_SIZE)
+        encoded = b64encode(content).decode()
+        wrapped = '\r\n'.join(
+            encoded[offset:offset + 76]
+            for offset in range(0, len(encoded), 76)
+        )
+        image_file = ImageBase64Field().to_internal_value(
+            f'data:image/png;base64,{wrapped}'
+        )
+        self.assertEqual(image_file.read(), content)
+        self.assertTrue(image_file.name.endswith('.png'))
+
+    def test_too_large_without_copy(self):
+        data = 'data:image/png;base64,' + 'A' * (4 * 1024 * 1024)
+        tracemalloc.start()
+        try:
+            with self.assertRaises(serializers.ValidationError) as error:
+                ImageBase64Field().to_internal_value(data)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(error.exception.detail[0].code, 'too_large')
+        self.assertLess(peak, 256 * 1024)
+
+    def test_too_large_after_decoding(self):
+        # Длина строки проходит проверку, но данных на пару байт больше.
+        data = 'data:image/png;base64,' + 'AAAA' * (1024 * 1024 // 3 + 1)
+        with self.assertRaises(serializers.ValidationError) as error:
+            ImageBase64Field().to_internal_value(data)
+        self.assertEqual(error.exception.detail[0].code, 'too_large')
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1', '10.0.0.0/8'])
+class MetricsViewTest(SimpleTestCase):
+    """/api/metrics отдаётся только адресам из METRICS_ALLOWED_IPS."""
+
+    def test_allowed(self):
+        for address in ('127.0.0.1', '10.1.2.3'):
+            with self.subTest(address):
+                response = Client(REMOTE_ADDR=address).get('/api/metrics')
+                self.assertEqual(response.status_code, 200)
+
+    def test_forbidden(self):
+        for address in ('172.18.0.5', '::1', 'unknown'):
+            with self.subTest(address):
+                response = Client(REMOTE_ADDR=address).get('/api/metrics')
+                self.assertEqual(response.status_code, 403)
@@ -1,6 +1,10 @@
 from django.urls import include, path
 
+from .views import metrics, profiling_stats
+
 urlpatterns = [
+    path('metrics', metrics, name='metrics'),
+    path('profiling/', profiling_stats, name='profiling-stats'),
     path('', include('recipes.urls')),
     path('', include('users.urls')), 
 ]
\ No newline at end of file
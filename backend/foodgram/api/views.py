@@ -0,0 +1,34 @@
+from ipaddress import ip_address, ip_network
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .metrics import render_metrics
+from .middleware import route_histograms
+
+
+def is_metrics_client(address):
+    try:
+        address = ip_address(address)
+    except ValueError:
+        return False
+    return any(
+        address in ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_IPS
+    )
+
+
+def metrics(request):
+    if not is_metrics_client(request.META.get('REMOTE_ADDR', '')):
+        return HttpResponseForbidden()
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profiling_stats(request):
+    return Response(route_histograms.snapshot())
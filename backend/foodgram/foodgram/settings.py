@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 DJANGO_SHORT_URL_REDIRECT_URL = ''
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.RequestProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -83,8 +86,80 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
         'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+        ),
+        'OPTIONS': {},
     }
 }
+# Пул psycopg 3 держит соединения сам, поэтому с ним CONN_MAX_AGE
+# должен быть 0, иначе Django откажется запускаться.
+if os.getenv('DB_POOL', 'False') == 'True':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+        'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+# locmem живёт в памяти одного воркера: инвалидация из соседних воркеров
+# до него не доходит, поэтому без Redis таймаут держим коротким.
+RECIPE_CACHE_ALIAS = 'default'
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 60))
+FEED_CACHE_TIMEOUT = int(os.getenv('FEED_CACHE_TIMEOUT', 30))
+FEED_HEAD_SIZE = 100
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+# Адреса и подсети, с которых можно читать /api/metrics: gunicorn слушает
+# 0.0.0.0, и без проверки эндпоинт доступен всем в сети compose.
+METRICS_ALLOWED_IPS = os.getenv(
+    'METRICS_ALLOWED_IPS', '127.0.0.1 ::1'
+).split()
+
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING', 'False') == 'True'
+REQUEST_PROFILING_DUPLICATE_THRESHOLD = int(
+    os.getenv('REQUEST_PROFILING_DUPLICATE_THRESHOLD', 5)
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '{asctime} {levelname} {name} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': os.getenv('LOG_LEVEL', 'WARNING'),
+    },
+    'loggers': {
+        'foodgram.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -120,6 +195,39 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+INGREDIENT_FUZZY_SEARCH_LIMIT = 20
+RECIPE_MATCH_INDEX_TTL = int(os.getenv('RECIPE_MATCH_INDEX_TTL', 3600))
+RECIPE_MATCH_SYNC_INTERVAL = int(os.getenv('RECIPE_MATCH_SYNC_INTERVAL', 5))
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_RECIPES_MAX_DF = 0.05
+
+TASK_WORKERS = int(os.getenv('TASK_WORKERS', 2))
+TASKS_ALWAYS_EAGER = os.getenv('TASKS_ALWAYS_EAGER', 'False') == 'True'
+
+IMAGE_VARIANTS = {
+    'thumbnail': (320, 320),
+    'full': (1280, 1280),
+}
+IMAGE_WEBP_QUALITY = 80
+IMAGE_MAX_UPLOAD_SIZE = int(
+    os.getenv('IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))
+
+# Вес добавления в избранное и в корзину и период полураспада вклада, ч.
+RECIPE_SCORE_WEIGHTS = {
+    'favorite': 1.0,
+    'cart': 0.5,
+}
+RECIPE_POPULAR_HALF_LIFE = int(os.getenv('RECIPE_POPULAR_HALF_LIFE', 30 * 24))
+RECIPE_TRENDING_HALF_LIFE = int(os.getenv('RECIPE_TRENDING_HALF_LIFE', 24))
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
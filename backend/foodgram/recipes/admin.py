@@ -12,10 +12,13 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('title', 'creator', 'cooking_time', 'publication_date')
+    list_display = (
+        'title', 'creator', 'cooking_time', 'publication_date',
+        'favorites_count', 'carts_count'
+    )
     search_fields = ('title', 'creator__username')
     list_filter = ('publication_date', 'cooking_time')
-    readonly_fields = ('publication_date',)
+    readonly_fields = ('publication_date', 'favorites_count', 'carts_count')
 
 
 @admin.register(RecipeIngredient)
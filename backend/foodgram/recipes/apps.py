@@ -5,4 +5,7 @@ class RecipesConfig(AppConfig):
     
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
-    verbose_name = 'Управление рецептами'
\ No newline at end of file
+    verbose_name = 'Управление рецептами'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,98 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+
+from .models import IngredientModel
+
+IndexEntries = namedtuple(
+    'IndexEntries', ('keys', 'ingredients', 'generation', 'built_at')
+)
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти процесса для автодополнения.
+
+    Хранит отсортированный массив названий в нижнем регистре: префиксный
+    поиск выполняется двоичным поиском без обращения к базе данных.
+    Индекс сбрасывается сигналами при изменении ингредиентов и, поскольку
+    сигналы не доходят до других воркеров, перестраивается не реже
+    чем раз в INGREDIENT_INDEX_TTL секунд.
+
+    Ключи и ингредиенты публикуются одним кортежем IndexEntries, так что
+    читатель не увидит новые ключи рядом со старыми ингредиентами.
+    invalidate() увеличивает поколение: сборка, начатая до сброса,
+    сразу считается устаревшей.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._entries = None
+
+    def invalidate(self):
+        self._generation += 1
+
+    def _is_stale(self, entries):
+        return (
+            entries is None
+            or entries.generation != self._generation
+            or time.monotonic() - entries.built_at
+            > settings.INGREDIENT_INDEX_TTL
+        )
+
+    def _build(self):
+        generation = self._generation
+        ingredients = sorted(
+            IngredientModel.objects.only('id', 'title', 'measurement_unit'),
+            key=lambda ingredient: ingredient.title.lower()
+        )
+        return IndexEntries(
+            tuple(ingredient.title.lower() for ingredient in ingredients),
+            tuple(ingredients), generation, time.monotonic()
+        )
+
+    def _ensure_built(self):
+        entries = self._entries
+        if self._is_stale(entries):
+            with self._lock:
+                entries = self._entries
+                if self._is_stale(entries):
+                    entries = self._entries = self._build()
+        return entries
+
+    def search(self, query):
+        query = query.strip().lower()
+        keys, ingredients, _, _ = self._ensure_built()
+        if not query:
+            return list(ingredients)
+
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        results = list(ingredients[start:end])
+        results.extend(
+            ingredient for key, ingredient in zip(keys, ingredients)
+            if query in key and not key.startswith(query)
+        )
+        if not results and connection.vendor == 'postgresql':
+            results = list(self.fuzzy_search(query))
+        return results
+
+    @staticmethod
+    def fuzzy_search(query):
+        return IngredientModel.objects.filter(
+            title__trigram_similar=query
+        ).annotate(
+            similarity=TrigramSimilarity('title', query)
+        ).order_by('-similarity', 'title')[
+            :settings.INGREDIENT_FUZZY_SEARCH_LIMIT
+        ]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,132 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.metrics import CACHE_REQUESTS
+
+GLOBAL_VERSION_KEY = 'recipes:version:global'
+LIST_VERSION_KEY = 'recipes:version:list'
+HITS_KEY = 'recipes:stats:hits'
+MISSES_KEY = 'recipes:stats:misses'
+
+
+class RecipeResponseCache:
+    """Кэш ответов списка и карточки рецепта для анонимных пользователей.
+
+    Ключи содержат номера версий: при изменении данных версия
+    увеличивается, и старые записи просто перестают читаться, а затем
+    вытесняются по таймауту. Карточка зависит от версии рецепта и общей
+    версии (авторы, ингредиенты), список — от версии списков и общей.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.RECIPE_CACHE_ALIAS]
+
+    @property
+    def enabled(self):
+        return settings.RECIPE_CACHE_TIMEOUT > 0
+
+    @staticmethod
+    def recipe_version_key(pk):
+        return f'recipes:version:recipe:{pk}'
+
+    def get_versions(self, *keys):
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                self.cache.add(key, time.time_ns(), None)
+                versions[key] = self.cache.get(key)
+        return ':'.join(str(versions[key]) for key in keys)
+
+    def bump(self, *keys):
+        for key in keys:
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, time.time_ns(), None)
+
+    def list_key(self, request):
+        versions = self.get_versions(GLOBAL_VERSION_KEY, LIST_VERSION_KEY)
+        params = hashlib.md5(
+            f'{request.get_host()}?{sorted(request.query_params.lists())}'
+            .encode()
+        ).hexdigest()
+        return f'recipes:list:{versions}:{params}'
+
+    def detail_key(self, request, pk):
+        versions = self.get_versions(
+            GLOBAL_VERSION_KEY, self.recipe_version_key(pk)
+        )
+        return f'recipes:detail:{pk}:{versions}:{request.get_host()}'
+
+    def get(self, key):
+        data = self.cache.get(key)
+        self.count(HITS_KEY if data is not None else MISSES_KEY)
+        CACHE_REQUESTS.labels(
+            'recipes', 'hit' if data is not None else 'miss'
+        ).inc()
+        return data
+
+    def set(self, key, data):
+        self.cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+
+    def count(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 0, None)
+            self.cache.incr(key)
+
+    def stats(self):
+        stats = self.cache.get_many((HITS_KEY, MISSES_KEY))
+        return {
+            'hits': stats.get(HITS_KEY, 0),
+            'misses': stats.get(MISSES_KEY, 0),
+        }
+
+    def invalidate_recipe(self, pk):
+        self.bump(self.recipe_version_key(pk), LIST_VERSION_KEY)
+
+    def invalidate_lists(self):
+        self.bump(LIST_VERSION_KEY)
+
+    def invalidate_all(self):
+        self.bump(GLOBAL_VERSION_KEY)
+
+
+recipe_cache = RecipeResponseCache()
+
+
+class AnonymousCacheMixin:
+    """Отдаёт list и retrieve анонимам из recipe_cache."""
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: recipe_cache.list_key(request),
+            super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: recipe_cache.detail_key(request, kwargs['pk']),
+            super().retrieve, *args, **kwargs
+        )
+
+    def get_cached_response(self, request, get_key, view_method,
+                            *args, **kwargs):
+        if request.user.is_authenticated or not recipe_cache.enabled:
+            return view_method(request, *args, **kwargs)
+        key = get_key()
+        data = recipe_cache.get(key)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+        response = view_method(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            recipe_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import Q
+
+from .models import Recipe
+from users.models import Follow
+
+# Слияние лент авторов на PostgreSQL: для каждого автора читается не
+# больше %(count)s записей по индексу (creator, publication_date, id),
+# поэтому стоимость растёт с числом подписок линейно и предсказуемо,
+# а не зависит от того, сколько рецептов у авторов всего.
+LATERAL_FEED_SQL = '''
+SELECT recipe.publication_date, recipe.id
+FROM users_follow AS follow
+CROSS JOIN LATERAL (
+    SELECT publication_date, id FROM recipes_recipe
+    WHERE creator_id = follow.following_id {position}
+    ORDER BY publication_date DESC, id DESC
+    LIMIT %(count)s
+) AS recipe
+WHERE follow.follower_id = %(user)s
+ORDER BY recipe.publication_date DESC, recipe.id DESC
+LIMIT %(count)s
+'''
+POSITION_SQL = (
+    'AND (publication_date, id) < (%(publication_date)s, %(pk)s)'
+)
+
+
+class FeedCache:
+    """Голова ленты подписок пользователя в кэше на FEED_CACHE_TIMEOUT.
+
+    Хранит первые FEED_HEAD_SIZE позиций (publication_date, id): первые
+    страницы ленты отдаются без слияния лент авторов. Сбрасывается при
+    подписке и отписке; новые рецепты авторов появляются в ленте, когда
+    голова истечёт.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.RECIPE_CACHE_ALIAS]
+
+    @staticmethod
+    def key(user_id):
+        return f'recipes:feed:{user_id}'
+
+    def get_head(self, user):
+        head = self.cache.get(self.key(user.pk))
+        if head is None:
+            head = merge_feeds(user, None, settings.FEED_HEAD_SIZE)
+            self.cache.set(
+                self.key(user.pk), head, settings.FEED_CACHE_TIMEOUT
+            )
+        return head
+
+    def invalidate(self, user_id):
+        self.cache.delete(self.key(user_id))
+
+
+feed_cache = FeedCache()
+
+
+def merge_feeds(user, position, count):
+    """count позиций ленты подписок строго после position."""
+    connection = connections[Recipe.objects.db]
+    if connection.vendor == 'postgresql':
+        params = {'user': user.pk, 'count': count}
+        if position is not None:
+            params['publication_date'], params['pk'] = position
+        with connection.cursor() as cursor:
+            cursor.execute(LATERAL_FEED_SQL.format(
+                position=POSITION_SQL if position is not None else ''
+            ), params)
+            return cursor.fetchall()
+
+    recipes = Recipe.objects.filter(
+        creator__in=Follow.objects.filter(
+            follower=user
+        ).values('following_id')
+    )
+    if position is not None:
+        publication_date, pk = position
+        recipes = recipes.filter(
+            Q(publication_date__lt=publication_date)
+            | Q(publication_date=publication_date, pk__lt=pk)
+        )
+    return list(recipes.order_by('-publication_date', '-id').values_list(
+        'publication_date', 'id'
+    )[:count])
+
+
+def get_feed_positions(user, position, count):
+    """count позиций после position: из кэшированной головы или из базы.
+
+    Голова короче FEED_HEAD_SIZE — значит, в ней вся лента. Иначе за её
+    пределами лента дочитывается слиянием от позиции курсора.
+    """
+    head = feed_cache.get_head(user)
+    complete = len(head) < settings.FEED_HEAD_SIZE
+    if position is not None:
+        head = [item for item in head if tuple(item) < tuple(position)]
+    if len(head) >= count or complete:
+        return head[:count]
+    return merge_feeds(user, position, count)
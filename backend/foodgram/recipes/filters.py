@@ -1,6 +1,16 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Exists, F, OuterRef, Q
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend, SearchFilter
 
-from .models import Recipe
+from .models import Recipe, RecipeIngredient
+
+SEARCH_CONFIGS = ('russian', 'english')
+RANKED_ORDERINGS = {
+    'popular': 'score__popular',
+    'trending': 'score__trending',
+}
 
 
 class RecipeFilterSet(filters.FilterSet):
@@ -19,4 +29,65 @@ class RecipeFilterSet(filters.FilterSet):
     def filter_cart_recipes(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
             return queryset.filter(in_carts__owner=self.request.user)
-        return queryset
\ No newline at end of file
+        return queryset
+
+
+class RecipeSearchFilter(SearchFilter):
+    """Полнотекстовый поиск по названию, ингредиентам и описанию.
+
+    На PostgreSQL ?search= ищет по колонке search_vector (её поддерживают
+    триггеры из миграции 0010) с GIN-индексом и сортирует по ts_rank:
+    совпадения в названии весят больше, чем в ингредиентах, а те — больше,
+    чем в описании. На SQLite каждое слово ищется через icontains по тем
+    же полям, без ранжирования. С ?cursor= порядок остаётся по дате
+    публикации, потому что курсор строится по ней.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return self.filter_by_terms(queryset, search_terms)
+
+        text = ' '.join(search_terms)
+        query = SearchQuery(text, config=SEARCH_CONFIGS[0],
+                            search_type='websearch')
+        for config in SEARCH_CONFIGS[1:]:
+            query |= SearchQuery(text, config=config, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-publication_date', '-id')
+
+    @staticmethod
+    def filter_by_terms(queryset, search_terms):
+        for term in search_terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term)
+                | Q(description__icontains=term)
+                | Exists(RecipeIngredient.objects.filter(
+                    recipe=OuterRef('pk'), ingredient__title__icontains=term
+                ))
+            )
+        return queryset
+
+
+class RecipeOrderingFilter(BaseFilterBackend):
+    """?ordering=popular|trending по заранее посчитанным RecipeScore.
+
+    Сортировка идёт по индексу рейтинга, без агрегации избранного
+    и корзин в запросе. Рецепты, добавленные после последнего запуска
+    refresh_recipe_scores, в такую выдачу ещё не попадают.
+    """
+
+    ordering_param = 'ordering'
+
+    def filter_queryset(self, request, queryset, view):
+        field = RANKED_ORDERINGS.get(
+            request.query_params.get(self.ordering_param)
+        )
+        if field is None:
+            return queryset
+        return queryset.filter(score__isnull=False).order_by(
+            f'-{field}', '-id'
+        )
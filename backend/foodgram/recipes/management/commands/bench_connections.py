@@ -0,0 +1,105 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность списка рецептов с новым '
+        'соединением к БД на каждый запрос и с текущими настройками '
+        '(CONN_MAX_AGE или пул psycopg)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на поток')
+        parser.add_argument('--url', default='/api/recipes/?limit=6')
+
+    def handle(self, *args, **options):
+        if not Recipe.objects.exists():
+            raise CommandError('В базе нет рецептов для замера')
+        db_settings = connections.settings['default']
+        configured = {
+            'CONN_MAX_AGE': db_settings['CONN_MAX_AGE'],
+            'pool': db_settings['OPTIONS'].get('pool'),
+        }
+        connections.close_all()
+        try:
+            db_settings['CONN_MAX_AGE'] = 0
+            db_settings['OPTIONS'].pop('pool', None)
+            baseline = self.measure(options)
+        finally:
+            connections.close_all()
+            db_settings['CONN_MAX_AGE'] = configured['CONN_MAX_AGE']
+            if configured['pool']:
+                db_settings['OPTIONS']['pool'] = configured['pool']
+        current = self.measure(options)
+        connections.close_all()
+
+        description = (
+            f'пул {configured["pool"]}' if configured['pool']
+            else f'CONN_MAX_AGE={configured["CONN_MAX_AGE"]}'
+        )
+        self.stdout.write(
+            f'Новое соединение на запрос: {self.format(baseline)}'
+        )
+        self.stdout.write(f'Текущие настройки ({description}): '
+                          f'{self.format(current)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Прирост пропускной способности: '
+            f'{current[0] / baseline[0]:.2f}x'
+        ))
+
+    @staticmethod
+    def measure(options):
+        latencies = []
+        errors = []
+        barrier = threading.Barrier(options['threads'])
+
+        def run():
+            client = Client()
+            timings = []
+            barrier.wait()
+            try:
+                for _ in range(options['requests']):
+                    started = time.perf_counter()
+                    response = client.get(options['url'])
+                    timings.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            finally:
+                connections.close_all()
+            latencies.extend(timings)
+
+        with override_settings(ALLOWED_HOSTS=['*'], RECIPE_CACHE_TIMEOUT=0):
+            threads = [
+                threading.Thread(target=run)
+                for _ in range(options['threads'])
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(f'{options["url"]}: ответы {set(errors)}')
+        latencies.sort()
+        return len(latencies) / elapsed, latencies
+
+    @staticmethod
+    def format(result):
+        rps, latencies = result
+        return (
+            f'{rps:.0f} запросов/с, '
+            f'p50 {statistics.median(latencies) * 1000:.2f} мс, '
+            f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} мс'
+        )
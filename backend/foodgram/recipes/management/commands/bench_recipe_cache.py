@@ -0,0 +1,60 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from recipes.cache import recipe_cache
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку анонимных запросов списка и карточки рецепта '
+        'с кэшем ответов и без него'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=6)
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.first()
+        if recipe is None:
+            raise CommandError('В базе нет рецептов для замера')
+        urls = {
+            'list': f'/api/recipes/?limit={options["limit"]}',
+            'detail': f'/api/recipes/{recipe.pk}/',
+        }
+        client = Client()
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for name, url in urls.items():
+                with override_settings(RECIPE_CACHE_TIMEOUT=0):
+                    uncached = self.measure(client, url, options['requests'])
+                cached = self.measure(client, url, options['requests'])
+                self.stdout.write(
+                    f'{name}: без кэша {self.format(uncached)}; '
+                    f'с кэшем {self.format(cached)}'
+                )
+        stats = recipe_cache.stats()
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}'
+        )
+
+    @staticmethod
+    def measure(client, url, requests):
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+        return sorted(timings)
+
+    @staticmethod
+    def format(timings):
+        p50 = statistics.median(timings) * 1000
+        p99 = timings[int(len(timings) * 0.99)] * 1000
+        return f'p50 {p50:.2f} мс, p99 {p99:.2f} мс'
@@ -0,0 +1,117 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from recipes.models import FavoriteRecipe, Recipe, update_counter
+from users.models import User
+
+BENCHMARK_PICTURE = 'recipe_images/benchmark.png'
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет пропускную способность параллельного добавления '
+        'и удаления одного рецепта в избранное'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument(
+            '--legacy',
+            action='store_true',
+            help='Старая схема: get_or_create и recipe.save() на каждый запрос'
+        )
+
+    def handle(self, *args, **options):
+        prefix = f'bench-{uuid.uuid4().hex[:8]}'
+        User.objects.bulk_create([
+            User(
+                email=f'{prefix}-{index}@example.com',
+                username=f'{prefix}-{index}',
+                first_name='Bench',
+                last_name='Bench'
+            )
+            for index in range(options['threads'] + 1)
+        ])
+        users = list(
+            User.objects.filter(username__startswith=prefix).order_by('pk')
+        )
+        author, workers = users[0], users[1:]
+        # Файла изображения нет: варианты помечены готовыми, чтобы
+        # сигнал не ставил задачу на их сборку.
+        recipe = Recipe.objects.create(
+            title=prefix,
+            description=prefix,
+            cooking_time=1,
+            picture=BENCHMARK_PICTURE,
+            picture_variants={'source': BENCHMARK_PICTURE},
+            creator=author
+        )
+        toggle = self.legacy_toggle if options['legacy'] else self.toggle
+        latencies = []
+        barrier = threading.Barrier(len(workers))
+
+        def run(user):
+            barrier.wait()
+            timings = []
+            try:
+                for _ in range(options['iterations']):
+                    for add in (True, False):
+                        started = time.perf_counter()
+                        toggle(user, recipe.pk, add)
+                        timings.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            latencies.extend(timings)
+
+        threads = [
+            threading.Thread(target=run, args=(user,)) for user in workers
+        ]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            recipe.refresh_from_db()
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+        latencies.sort()
+        self.stdout.write(
+            f'Операций: {len(latencies)} за {elapsed:.2f} с, '
+            f'{len(latencies) / elapsed:.0f} оп/с; '
+            f'p50 {statistics.median(latencies) * 1000:.2f} мс, '
+            f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} мс; '
+            f'favorites_count после теста: {recipe.favorites_count}'
+        )
+
+    @staticmethod
+    def toggle(user, recipe_id, add):
+        recipes = Recipe.objects.filter(pk=recipe_id)
+        with transaction.atomic():
+            if add:
+                changed = FavoriteRecipe.objects.add(
+                    user, recipes.only('id').get()
+                )
+            else:
+                changed = FavoriteRecipe.objects.remove(user, recipe_id)
+            if changed:
+                update_counter(
+                    recipes, 'favorites_count', 1 if add else -1
+                )
+
+    @staticmethod
+    def legacy_toggle(user, recipe_id, add):
+        recipe = Recipe.objects.get(pk=recipe_id)
+        if add:
+            FavoriteRecipe.objects.get_or_create(owner=user, recipe=recipe)
+        else:
+            user.favorite_recipes.filter(recipe=recipe).delete()
+        recipe.save()
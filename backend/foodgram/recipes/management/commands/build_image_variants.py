@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from PIL import Image, UnidentifiedImageError
+
+from api.images import build_variants
+from recipes.models import Recipe
+from users.models import User
+
+IMAGE_FIELDS = (
+    (Recipe, 'picture', 'picture_variants'),
+    (User, 'profile_picture', 'avatar_variants'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит миниатюры и WebP-варианты изображений, которых ещё нет: '
+        'после массового импорта или потерянных фоновых задач. '
+        'Отсутствующие и битые файлы пропускаются'
+    )
+
+    def handle(self, *args, **options):
+        failed = 0
+        for model, field_name, variants_field in IMAGE_FIELDS:
+            built = 0
+            rows = model.objects.exclude(
+                **{field_name: ''}
+            ).exclude(
+                **{f'{field_name}__isnull': True}
+            ).values_list('pk', field_name, variants_field)
+            for pk, name, variants in rows.iterator():
+                if (variants or {}).get('source') == name:
+                    continue
+                try:
+                    build_variants(model._meta.label, pk, field_name,
+                                   variants_field)
+                except (OSError, UnidentifiedImageError,
+                        Image.DecompressionBombError) as error:
+                    failed += 1
+                    self.stderr.write(self.style.WARNING(
+                        f'{model._meta.verbose_name} {pk} ({name}): {error}'
+                    ))
+                    continue
+                built += 1
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: обработано {built}'
+            )
+        if failed:
+            self.stderr.write(self.style.WARNING(
+                f'Не удалось обработать изображений: {failed}'
+            ))
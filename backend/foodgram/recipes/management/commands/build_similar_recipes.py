@@ -0,0 +1,111 @@
+import time
+import tracemalloc
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.matching import recipe_match_index
+from recipes.similarity import build_matrix, save_neighbors, top_neighbors
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает списки похожих рецептов для всех рецептов. С '
+        '--benchmark замеряет время и память построения на синтетических '
+        'данных заданных объёмов, не трогая базу'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Строк матрицы на одно произведение')
+        parser.add_argument(
+            '--benchmark', metavar='SIZES',
+            help='Число рецептов через запятую, например 10000,100000,1000000'
+        )
+        parser.add_argument('--ingredients', type=int, default=2000,
+                            help='Размер словаря ингредиентов в бенчмарке')
+        parser.add_argument('--per-recipe', type=int, default=8,
+                            help='Ингредиентов на рецепт в бенчмарке')
+        parser.add_argument('--sample', type=int, default=10_000,
+                            help='Рецептов, для которых бенчмарк ищет '
+                                 'соседей; время на все экстраполируется')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            try:
+                sizes = [int(size) for size in options['benchmark'].split(',')]
+            except ValueError:
+                raise CommandError('--benchmark — числа через запятую')
+            for size in sizes:
+                self.benchmark(size, options)
+            return
+
+        started = time.perf_counter()
+        recipe_match_index.invalidate()
+        arrays = recipe_match_index.snapshot()
+        matrix = build_matrix(
+            arrays.ingredients, arrays.positions, len(arrays.recipe_ids)
+        )
+        built = time.perf_counter() - started
+        saved = save_neighbors(
+            arrays.recipe_ids,
+            self.all_neighbors(matrix, options['batch_size'])
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов: {len(arrays.recipe_ids)}, записано пар: {saved}. '
+            f'Матрица: {built:.2f} с, всего: '
+            f'{time.perf_counter() - started:.2f} с'
+        ))
+
+    @staticmethod
+    def all_neighbors(matrix, batch_size, rows=None):
+        if rows is None:
+            rows = range(matrix.shape[0])
+        for start in range(0, len(rows), batch_size):
+            yield from top_neighbors(
+                matrix, list(rows[start:start + batch_size]),
+                settings.SIMILAR_RECIPES_COUNT
+            )
+
+    def benchmark(self, size, options):
+        random = np.random.default_rng(options['seed'])
+        # Популярность ингредиентов по закону Ципфа: ингредиент ранга r
+        # встречается пропорционально 1 / r.
+        weights = 1 / np.arange(1, options['ingredients'] + 1)
+        ingredients = random.choice(
+            options['ingredients'], size * options['per_recipe'],
+            p=weights / weights.sum()
+        )
+        positions = np.repeat(
+            np.arange(size, dtype=np.int32), options['per_recipe']
+        )
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        matrix = build_matrix(ingredients, positions, size)
+        built = time.perf_counter() - started
+        _, build_peak = tracemalloc.get_traced_memory()
+        matrix_bytes = (
+            matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        )
+
+        tracemalloc.reset_peak()
+        sample = min(options['sample'], size)
+        rows = random.choice(size, sample, replace=False)
+        started = time.perf_counter()
+        for _ in self.all_neighbors(matrix, options['batch_size'], rows):
+            pass
+        elapsed = time.perf_counter() - started
+        _, neighbors_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f'{size:>9} рецептов: матрица {built:6.2f} с, '
+            f'{matrix_bytes / 2**20:7.1f} МБ '
+            f'(пик {build_peak / 2**20:7.1f} МБ); '
+            f'соседи для {sample}: {elapsed:6.2f} с '
+            f'(пик {neighbors_peak / 2**20:6.1f} МБ), '
+            f'на все ≈ {elapsed / sample * size:7.0f} с'
+        )
@@ -0,0 +1,187 @@
+import io
+import statistics
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (
+    FavoriteRecipe, IngredientModel, Recipe, ShoppingCart
+)
+from users.models import Follow, User
+
+# (название, шаблон URL, нужен ли токен, бюджет запросов к БД).
+# Бюджет не должен зависеть ни от размера страницы, ни от объёма данных.
+# Те же бюджеты как точное число запросов проверяет recipes.tests.
+ENDPOINTS = (
+    ('recipes: список', '/api/recipes/?limit={limit}', False, 6),
+    ('recipes: список', '/api/recipes/?limit={limit}', True, 9),
+    ('recipes: cursor', '/api/recipes/?limit={limit}&cursor=', True, 8),
+    ('recipes: ?creator', '/api/recipes/?limit={limit}&creator={author}',
+     True, 11),
+    ('recipes: ?is_favorited', '/api/recipes/?limit={limit}&is_favorited=1',
+     True, 9),
+    ('recipes: ?is_in_shopping_cart',
+     '/api/recipes/?limit={limit}&is_in_shopping_cart=1', True, 9),
+    ('recipes: лента подписок', '/api/recipes/feed/?limit={limit}', True, 6),
+    ('recipes: карточка', '/api/recipes/{recipe}/', True, 7),
+    ('recipes: список покупок', '/api/recipes/download_shopping_cart/',
+     True, 3),
+    ('ingredients: поиск', '/api/ingredients/?name=а', False, 1),
+    ('ingredients: карточка', '/api/ingredients/{ingredient}/', False, 2),
+    ('users: список', '/api/users/?limit={limit}', True, 6),
+    ('users: карточка', '/api/users/{author}/', True, 5),
+    ('users: me', '/api/users/me/', True, 1),
+    ('users: подписки',
+     '/api/users/subscriptions/?limit={limit}&recipes_limit=3', True, 5),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет, что число SQL-запросов каждого эндпоинта укладывается '
+        'в бюджет и не растёт с размером страницы и объёмом данных, '
+        'а медианное время ответа не превышает порог. Работает на '
+        'отдельной тестовой базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-sizes', default='1,10,50',
+            help='Размеры страниц через запятую'
+        )
+        parser.add_argument(
+            '--volumes', default='100,1000',
+            help='Число рецептов в базе через запятую'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--max-ms', type=float, default=250,
+            help='Порог медианного времени ответа, мс'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            page_sizes = [
+                int(size) for size in options['page_sizes'].split(',')
+            ]
+            volumes = [
+                int(volume) for volume in options['volumes'].split(',')
+            ]
+        except ValueError:
+            raise CommandError(
+                '--page-sizes и --volumes — числа через запятую'
+            )
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=['*'], RECIPE_CACHE_TIMEOUT=0,
+                FEED_CACHE_TIMEOUT=0
+            ):
+                results = {}
+                for volume in volumes:
+                    context = self.prepare_data(volume)
+                    for page_size in page_sizes:
+                        context['limit'] = page_size
+                        for endpoint in ENDPOINTS:
+                            results.setdefault(endpoint, []).append(
+                                self.measure(endpoint, context, options)
+                            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        failures = self.report(results, options['max_ms'])
+        if failures:
+            raise CommandError(
+                f'Бюджет нарушен у {failures} эндпоинтов'
+            )
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены'))
+
+    def prepare_data(self, volume):
+        call_command('flush', interactive=False, verbosity=0)
+        IngredientModel.objects.bulk_create(
+            IngredientModel(title=f'ингредиент {index}', measurement_unit='г')
+            for index in range(50)
+        )
+        call_command(
+            'generate_fake_data',
+            users=max(volume // 10, 10), recipes=volume, seed=volume,
+            stdout=io.StringIO()
+        )
+        user = User.objects.order_by('-recipes_count').first()
+        reader = User.objects.exclude(pk=user.pk).order_by('pk').first()
+        # Случайные данные могут оставить корзину или подписки читателя
+        # пустыми, а на пустой выдаче часть запросов не выполняется.
+        recipes = Recipe.objects.order_by('pk')[:60]
+        for model in (FavoriteRecipe, ShoppingCart):
+            model.objects.bulk_create(
+                (model(owner=reader, recipe=recipe) for recipe in recipes),
+                ignore_conflicts=True
+            )
+        Follow.objects.get_or_create(follower=reader, following=user)
+        token = Token.objects.create(user=reader)
+        return {
+            'token': token.key,
+            'author': user.pk,
+            'recipe': Recipe.objects.order_by('-favorites_count').first().pk,
+            'ingredient': IngredientModel.objects.first().pk,
+        }
+
+    @staticmethod
+    def measure(endpoint, context, options):
+        _, url, authenticated, _ = endpoint
+        client = Client(
+            HTTP_AUTHORIZATION=(
+                f'Token {context["token"]}' if authenticated else ''
+            )
+        )
+        url = url.format(**context)
+        timings = []
+        for _ in range(options['repeat']):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                return response.status_code, len(queries), None
+        return 200, len(queries), statistics.median(timings) * 1000
+
+    def report(self, results, max_ms):
+        failures = 0
+        self.stdout.write(
+            f'{"Эндпоинт":<32} {"токен":>5} {"бюджет":>6} '
+            f'{"запросов":>14} {"медиана, мс":>12}  результат'
+        )
+        for (name, _, authenticated, budget), runs in results.items():
+            counts = sorted({count for _, count, _ in runs})
+            errors = {status for status, _, _ in runs if status != 200}
+            slowest = max((ms for _, _, ms in runs if ms is not None),
+                          default=0)
+            problems = []
+            if errors:
+                problems.append(f'ответ {", ".join(map(str, errors))}')
+            if len(counts) > 1:
+                problems.append('число запросов растёт')
+            if counts[-1] > budget:
+                problems.append('бюджет превышен')
+            if slowest > max_ms:
+                problems.append('медленно')
+            failures += bool(problems)
+            self.stdout.write(
+                f'{name:<32} {"да" if authenticated else "нет":>5} '
+                f'{budget:>6} {"–".join(map(str, counts)):>14} '
+                f'{slowest:>12.1f}  '
+                + (self.style.ERROR('; '.join(problems)) if problems
+                   else self.style.SUCCESS('ok'))
+            )
+        return failures
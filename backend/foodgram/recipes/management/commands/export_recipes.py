@@ -0,0 +1,68 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.models import Recipe, RecipeIngredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает рецепты с ингредиентами и ссылками на изображения '
+        'в формате JSON Lines'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-', help='По умолчанию — stdout'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.select_related('creator').prefetch_related(
+            Prefetch(
+                'ingredient_amounts',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        ).defer('search_vector').order_by('pk')
+        started = time.perf_counter()
+        exported = 0
+        output = (
+            sys.stdout if options['path'] == '-'
+            else open(options['path'], 'w', encoding='utf-8')
+        )
+        try:
+            for recipe in recipes.iterator(chunk_size=options['batch_size']):
+                output.write(json.dumps(
+                    self.serialize(recipe), ensure_ascii=False
+                ) + '\n')
+                exported += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f'Выгружено {exported} рецептов за {elapsed:.2f} с'
+        )
+
+    @staticmethod
+    def serialize(recipe):
+        return {
+            'id': recipe.pk,
+            'title': recipe.title,
+            'description': recipe.description,
+            'cooking_time': recipe.cooking_time,
+            'publication_date': recipe.publication_date.isoformat(),
+            'creator': recipe.creator.email,
+            'picture': recipe.picture.name,
+            'ingredients': [
+                {
+                    'name': amount.ingredient.title,
+                    'measurement_unit': amount.ingredient.measurement_unit,
+                    'amount': amount.quantity,
+                }
+                for amount in recipe.ingredient_amounts.all()
+            ],
+        }
@@ -0,0 +1,182 @@
+import io
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from recipes.autocomplete import ingredient_index
+from recipes.cache import recipe_cache
+from recipes.models import (
+    FavoriteRecipe, IngredientModel, Recipe, RecipeIngredient, ShoppingCart
+)
+from users.models import Follow, User
+
+PICTURE_NAME = 'recipe_images/fake.png'
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт пользователей, рецепты, подписки, избранное и корзины '
+        'для нагрузочного тестирования. Популярность авторов и рецептов '
+        'распределена по закону Ципфа'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок на пользователя в среднем')
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Рецептов в избранном на пользователя')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Рецептов в корзине на пользователя')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель степени распределения Ципфа')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить публикации')
+        parser.add_argument('--prefix', default='fake')
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredient_ids = list(
+            IngredientModel.objects.values_list('id', flat=True)
+        )
+        if not ingredient_ids:
+            raise CommandError(
+                'Нет ингредиентов: сначала выполните import_ingredients'
+            )
+
+        users = self.create_users(options)
+        recipes = self.create_recipes(options, users, ingredient_ids)
+        self.create_relations(
+            Follow, 'follower', 'following_id', users, users,
+            options['follows'], options['skew']
+        )
+        self.create_relations(
+            FavoriteRecipe, 'owner', 'recipe_id', users, recipes,
+            options['favorites'], options['skew'], options['days']
+        )
+        self.create_relations(
+            ShoppingCart, 'owner', 'recipe_id', users, recipes,
+            options['carts'], options['skew'], options['days']
+        )
+        call_command('recount_counters', stdout=io.StringIO())
+        call_command('refresh_recipe_scores', full=True, stdout=io.StringIO())
+        ingredient_index.invalidate()
+        recipe_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, рецептов: {len(recipes)}. '
+            f'Пароль: {options["password"]}'
+        ))
+
+    def create_users(self, options):
+        prefix = options['prefix']
+        offset = User.objects.filter(username__startswith=prefix).count()
+        password = make_password(options['password'])
+        users = [
+            User(
+                email=f'{prefix}{index}@example.com',
+                username=f'{prefix}{index}',
+                first_name='Тест',
+                last_name=f'Пользователь {index}',
+                password=password
+            )
+            for index in range(offset, offset + options['users'])
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return list(User.objects.filter(
+            username__in=[user.username for user in users]
+        ).values_list('id', flat=True))
+
+    def create_recipes(self, options, users, ingredient_ids):
+        if not default_storage.exists(PICTURE_NAME):
+            buffer = io.BytesIO()
+            Image.new('RGB', (64, 64), 'orange').save(buffer, 'PNG')
+            default_storage.save(PICTURE_NAME, ContentFile(buffer.getvalue()))
+
+        authors = self.zipf_sampler(users, options['skew'])
+        now = timezone.now()
+        recipe_ids = []
+        for start in range(0, options['recipes'], self.batch_size):
+            recipes = [
+                Recipe(
+                    title=f'Рецепт {index}',
+                    description='Сгенерированный рецепт для нагрузочных '
+                                'тестов.',
+                    cooking_time=self.random.randint(5, 180),
+                    picture=PICTURE_NAME,
+                    creator_id=authors()
+                )
+                for index in range(
+                    start, min(start + self.batch_size, options['recipes'])
+                )
+            ]
+            with transaction.atomic():
+                Recipe.objects.bulk_create(recipes)
+                for recipe in recipes:
+                    recipe.publication_date = now - timedelta(
+                        seconds=self.random.randint(
+                            0, options['days'] * 24 * 3600
+                        )
+                    )
+                Recipe.objects.bulk_update(recipes, ['publication_date'])
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(
+                        recipe_id=recipe.pk,
+                        ingredient_id=ingredient_id,
+                        quantity=self.random.randint(1, 500)
+                    )
+                    for recipe in recipes
+                    for ingredient_id in self.random.sample(
+                        ingredient_ids,
+                        min(len(ingredient_ids), self.random.randint(3, 10))
+                    )
+                )
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+        return recipe_ids
+
+    def create_relations(self, model, owner_field, target_field, owners,
+                         targets, per_owner, skew, days=None):
+        if not targets or per_owner < 1:
+            return
+        sample = self.zipf_sampler(targets, skew)
+        now = timezone.now()
+        relations = []
+        for owner_id in owners:
+            count = self.random.randint(0, 2 * per_owner)
+            chosen = {sample() for _ in range(count)}
+            chosen.discard(owner_id if model is Follow else None)
+            for pk in chosen:
+                relation = model(
+                    **{f'{owner_field}_id': owner_id, target_field: pk}
+                )
+                if days is not None:
+                    relation.created_at = now - timedelta(
+                        seconds=self.random.randint(0, days * 24 * 3600)
+                    )
+                relations.append(relation)
+        model.objects.bulk_create(
+            relations, batch_size=self.batch_size, ignore_conflicts=True
+        )
+
+    def zipf_sampler(self, population, skew):
+        population = list(population)
+        self.random.shuffle(population)
+        cum_weights = list(accumulate(
+            1 / (rank ** skew) for rank in range(1, len(population) + 1)
+        ))
+        return lambda: self.random.choices(
+            population, cum_weights=cum_weights
+        )[0]
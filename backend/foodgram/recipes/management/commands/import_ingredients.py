@@ -1,43 +1,182 @@
-from django.core.management.base import BaseCommand
-from recipes.models import IngredientModel
+import csv
+import io
 import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes.autocomplete import ingredient_index
+from recipes.cache import recipe_cache
+from recipes.models import IngredientModel
+
+DEFAULT_MEASUREMENT_UNIT = 'г.'
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if not row or not row[0].strip():
+            continue
+        unit = row[1] if len(row) > 1 else DEFAULT_MEASUREMENT_UNIT
+        yield row[0], unit
+
+
+def read_json(file):
+    """Читает JSON-массив объектов по одному, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(JSON_CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started:
+                if position == len(buffer):
+                    break
+                if buffer[position] != '[':
+                    raise ValueError('ожидался массив')
+                started = True
+                position += 1
+                continue
+            if buffer[position:position + 1] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item['name'], item.get(
+                'measurement_unit', DEFAULT_MEASUREMENT_UNIT
+            )
+        if not chunk:
+            raise ValueError('файл оборван')
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
 
 
 class Command(BaseCommand):
-    help = 'Импортирует ингредиенты из файла ingredients.json'
+    help = (
+        'Импортирует ингредиенты из CSV или JSON. Повторный запуск '
+        'не создаёт дубликатов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='../data/ingredients.json'
+        )
+        parser.add_argument(
+            '--format', choices=READERS, help='По умолчанию — по расширению'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY при загрузке в пустую таблицу'
+        )
 
     def handle(self, *args, **options):
-        file_path = '../data/ingredients.json'
+        self.verbosity = options['verbosity']
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
 
+        use_copy = (
+            not options['no_copy']
+            and connection.vendor == 'postgresql'
+            and not IngredientModel.objects.exists()
+        )
+        write_batch = self.copy_batch if use_copy else self.insert_batch
+        before = IngredientModel.objects.count()
+        processed = 0
+        started = time.perf_counter()
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-
-                ingredients = [
-                    IngredientModel(
-                        title=item['name'],
-                        measurement_unit=item.get('measurement_unit', 'г.')
-                    )
-                    for item in data
-                ]
-
-                IngredientModel.objects.bulk_create(ingredients, ignore_conflicts=True)
-
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Успешно импортировано {len(ingredients)} ингредиентов'
-                    )
-                )
-
+            with open(path, encoding='utf-8', newline='') as file:
+                rows = self.unique_rows(READERS[file_format](file))
+                with transaction.atomic():
+                    while batch := list(islice(rows, options['batch_size'])):
+                        write_batch(batch)
+                        processed += len(batch)
+                        self.report_progress(processed, started)
         except FileNotFoundError:
-            self.stdout.write(
-                self.style.ERROR(f'Файл не найден: {file_path}')
-            )
-        except json.JSONDecodeError:
-            self.stdout.write(
-                self.style.ERROR('Ошибка: Некорректный формат JSON')
-            )
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f'Ошибка: {str(e)}')
+            raise CommandError(f'Файл не найден: {path}')
+        except (KeyError, TypeError, ValueError, csv.Error) as error:
+            raise CommandError(
+                f'Некорректные данные в {path} после строки {processed}: '
+                f'{error}'
             )
+
+        created = IngredientModel.objects.count() - before
+        if created:
+            ingredient_index.invalidate()
+            recipe_cache.invalidate_all()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано {processed} строк за {elapsed:.2f} с '
+            f'({processed / elapsed:.0f} строк/с), добавлено {created} '
+            f'ингредиентов{" через COPY" if use_copy else ""}'
+        ))
+
+    @staticmethod
+    def unique_rows(rows):
+        seen = set()
+        for title, measurement_unit in rows:
+            row = (title.strip(), measurement_unit.strip())
+            if row not in seen:
+                seen.add(row)
+                yield row
+
+    def report_progress(self, processed, started):
+        if self.verbosity < 2:
+            return
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Обработано {processed} строк, '
+            f'{processed / elapsed:.0f} строк/с'
+        )
+
+    @staticmethod
+    def insert_batch(batch):
+        IngredientModel.objects.bulk_create(
+            [
+                IngredientModel(title=title, measurement_unit=unit)
+                for title, unit in batch
+            ],
+            ignore_conflicts=True
+        )
+
+    @staticmethod
+    def copy_batch(batch):
+        table = IngredientModel._meta.db_table
+        sql = (
+            f'COPY {connection.ops.quote_name(table)} '
+            '(title, measurement_unit, updated_at) FROM STDIN'
+        )
+        updated_at = timezone.now()
+        with connection.cursor() as cursor:
+            if hasattr(cursor, 'copy_expert'):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    (title, unit, updated_at.isoformat())
+                    for title, unit in batch
+                )
+                buffer.seek(0)
+                cursor.copy_expert(f'{sql} WITH (FORMAT csv)', buffer)
+            else:
+                with cursor.copy(sql) as copy:
+                    for title, unit in batch:
+                        copy.write_row((title, unit, updated_at))
@@ -0,0 +1,215 @@
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.autocomplete import ingredient_index
+from recipes.cache import recipe_cache
+from recipes.models import (
+    MAX_AMOUNT, IngredientModel, Recipe, RecipeIngredient, update_counter
+)
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает рецепты из JSON Lines, выгруженного export_recipes. '
+        'Прерванную загрузку можно продолжить с последней сохранённой '
+        'пачки; уже загруженные рецепты (автор, название, дата '
+        'публикации) пропускаются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Потоков для копирования изображений'
+        )
+        parser.add_argument(
+            '--source-media',
+            help='Каталог, из которого копировать изображения в хранилище. '
+                 'Без него ссылки на изображения сохраняются как есть'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с номером последней загруженной строки, '
+                 'по умолчанию <path>.checkpoint'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать сначала, не читая контрольную точку'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError(
+                '--batch-size и --workers должны быть больше нуля'
+            )
+        checkpoint = Path(
+            options['checkpoint'] or f'{path}.checkpoint'
+        )
+        self.source_media = (
+            Path(options['source_media']) if options['source_media']
+            else None
+        )
+        position = 0
+        if checkpoint.exists() and not options['restart']:
+            position = int(checkpoint.read_text())
+            self.stdout.write(f'Продолжаем со строки {position + 1}')
+
+        imported = skipped = 0
+        started = time.perf_counter()
+        try:
+            file = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            raise CommandError(f'Файл не найден: {path}')
+        with file, ThreadPoolExecutor(options['workers']) as executor:
+            lines = islice(file, position, None)
+            while batch := list(islice(lines, options['batch_size'])):
+                try:
+                    items = [json.loads(line) for line in batch]
+                    created = self.import_batch(items, executor)
+                except (KeyError, TypeError, ValueError) as error:
+                    raise CommandError(
+                        f'Некорректные данные в {path} после строки '
+                        f'{position}: {error}'
+                    )
+                position += len(batch)
+                imported += created
+                skipped += len(batch) - created
+                self.save_checkpoint(checkpoint, position)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'Загружено {imported} рецептов, '
+                    f'{imported / elapsed:.0f} рецептов/с'
+                )
+
+        checkpoint.unlink(missing_ok=True)
+        if imported:
+            ingredient_index.invalidate()
+            recipe_cache.invalidate_all()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {imported} рецептов за {elapsed:.2f} с, '
+            f'пропущено {skipped} (автор не найден или рецепт уже загружен)'
+        ))
+
+    def import_batch(self, items, executor):
+        creators = dict(User.objects.filter(
+            email__in={item['creator'] for item in items}
+        ).values_list('email', 'id'))
+        items = [item for item in items if item['creator'] in creators]
+        for item in items:
+            item['creator_id'] = creators[item['creator']]
+            item['publication_date'] = parse_datetime(item['publication_date'])
+        # Контрольная точка пишется после коммита пачки: если процесс упал
+        # между ними, при продолжении пачка придёт повторно.
+        existing = set(Recipe.objects.filter(
+            creator_id__in={item['creator_id'] for item in items},
+            publication_date__in={item['publication_date'] for item in items}
+        ).values_list('creator_id', 'title', 'publication_date'))
+        items = [
+            item for item in items
+            if (item['creator_id'], item['title'], item['publication_date'])
+            not in existing
+        ]
+        ingredients = self.get_ingredients(items)
+        pictures = list(executor.map(
+            self.copy_picture, (item['picture'] for item in items)
+        ))
+
+        recipes = [
+            Recipe(
+                title=item['title'],
+                description=item['description'],
+                cooking_time=item['cooking_time'],
+                picture=picture,
+                creator_id=item['creator_id']
+            )
+            for item, picture in zip(items, pictures)
+        ]
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes)
+            # auto_now_add перезаписывает дату при вставке,
+            # поэтому исходную восстанавливаем отдельным запросом.
+            for recipe, item in zip(recipes, items):
+                recipe.publication_date = item['publication_date']
+            Recipe.objects.bulk_update(recipes, ['publication_date'])
+
+            amounts = Counter()
+            for recipe, item in zip(recipes, items):
+                for ingredient in item['ingredients']:
+                    amounts[recipe.pk, ingredients[
+                        ingredient['name'], ingredient['measurement_unit']
+                    ]] += ingredient['amount']
+            # Повторы ингредиента в рецепте складываются, но сумма не
+            # должна выйти за пределы, допустимые для поля.
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    quantity=min(quantity, MAX_AMOUNT)
+                )
+                for (recipe_id, ingredient_id), quantity in amounts.items()
+            )
+
+            recipes_per_creator = Counter(
+                recipe.creator_id for recipe in recipes
+            )
+            creators_per_count = {}
+            for creator_id, count in recipes_per_creator.items():
+                creators_per_count.setdefault(count, []).append(creator_id)
+            for count, creator_ids in creators_per_count.items():
+                update_counter(
+                    User.objects.filter(pk__in=creator_ids),
+                    'recipes_count', count
+                )
+        return len(recipes)
+
+    @staticmethod
+    def get_ingredients(items):
+        keys = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for item in items for ingredient in item['ingredients']
+        }
+        IngredientModel.objects.bulk_create(
+            [
+                IngredientModel(title=title, measurement_unit=unit)
+                for title, unit in keys
+            ],
+            ignore_conflicts=True
+        )
+        return {
+            (title, unit): pk
+            for pk, title, unit in IngredientModel.objects.filter(
+                title__in={title for title, _ in keys}
+            ).values_list('id', 'title', 'measurement_unit')
+            if (title, unit) in keys
+        }
+
+    def copy_picture(self, name):
+        if self.source_media is None or default_storage.exists(name):
+            return name
+        try:
+            with open(self.source_media / name, 'rb') as source:
+                return default_storage.save(name, File(source))
+        except FileNotFoundError:
+            raise CommandError(f'Изображение не найдено: {name}')
+
+    @staticmethod
+    def save_checkpoint(checkpoint, position):
+        temporary = checkpoint.with_name(f'{checkpoint.name}.tmp')
+        temporary.write_text(str(position))
+        os.replace(temporary, checkpoint)
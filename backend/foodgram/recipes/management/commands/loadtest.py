@@ -0,0 +1,250 @@
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class LoadTestUser:
+    """Виртуальный пользователь: своя сессия и токен, случайные сценарии."""
+
+    def __init__(self, command, base_url, token, catalog, seed):
+        self.command = command
+        self.base_url = base_url
+        self.catalog = catalog
+        self.random = random.Random(seed)
+        self.session = requests.Session()
+        if token:
+            self.session.headers['Authorization'] = f'Token {token}'
+
+    def request(self, name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, f'{self.base_url}{path}', timeout=30, **kwargs
+            )
+            failed = response.status_code >= 400
+        except requests.RequestException:
+            failed = True
+        self.command.record(name, time.perf_counter() - started, failed)
+
+    def recipe_id(self):
+        return self.random.choice(self.catalog['recipes'])
+
+    def recipe_list(self):
+        self.request('recipes: список', 'GET', '/api/recipes/?limit=6')
+
+    def recipe_list_cursor(self):
+        self.request(
+            'recipes: список (cursor)', 'GET', '/api/recipes/?limit=6&cursor='
+        )
+
+    def recipe_list_by_author(self):
+        author = self.random.choice(self.catalog['authors'])
+        self.request(
+            'recipes: ?creator', 'GET',
+            f'/api/recipes/?limit=6&creator={author}'
+        )
+
+    def recipe_list_by_title(self):
+        title = self.random.choice(self.catalog['titles'])
+        self.request(
+            'recipes: ?title', 'GET', '/api/recipes/',
+            params={'limit': 6, 'title': title}
+        )
+
+    def recipe_list_favorited(self):
+        self.request(
+            'recipes: ?is_favorited', 'GET',
+            '/api/recipes/?limit=6&is_favorited=1'
+        )
+
+    def recipe_list_in_cart(self):
+        self.request(
+            'recipes: ?is_in_shopping_cart', 'GET',
+            '/api/recipes/?limit=6&is_in_shopping_cart=1'
+        )
+
+    def recipe_detail(self):
+        self.request(
+            'recipes: карточка', 'GET', f'/api/recipes/{self.recipe_id()}/'
+        )
+
+    def ingredient_search(self):
+        name = self.random.choice(self.catalog['ingredients'])
+        self.request(
+            'ingredients: поиск', 'GET', '/api/ingredients/',
+            params={'name': name[:self.random.randint(1, 4)]}
+        )
+
+    def subscriptions(self):
+        self.request(
+            'users: подписки', 'GET',
+            '/api/users/subscriptions/?limit=6&recipes_limit=3'
+        )
+
+    def favorite_toggle(self):
+        recipe_id = self.recipe_id()
+        path = f'/api/recipes/{recipe_id}/favorite/'
+        self.request('favorite: добавить', 'POST', path)
+        self.request('favorite: удалить', 'DELETE', path)
+
+    def shopping_cart_toggle(self):
+        recipe_id = self.recipe_id()
+        path = f'/api/recipes/{recipe_id}/shopping_cart/'
+        self.request('shopping_cart: добавить', 'POST', path)
+        self.request('shopping_cart: удалить', 'DELETE', path)
+
+    def download_shopping_cart(self):
+        self.request(
+            'shopping_cart: скачать', 'GET',
+            '/api/recipes/download_shopping_cart/'
+        )
+
+    def scenarios(self):
+        scenarios = [
+            (self.recipe_list, 10),
+            (self.recipe_list_cursor, 3),
+            (self.recipe_list_by_author, 3),
+            (self.recipe_list_by_title, 2),
+            (self.recipe_detail, 8),
+            (self.ingredient_search, 5),
+        ]
+        if 'Authorization' in self.session.headers:
+            scenarios += [
+                (self.recipe_list_favorited, 2),
+                (self.recipe_list_in_cart, 2),
+                (self.subscriptions, 3),
+                (self.favorite_toggle, 2),
+                (self.shopping_cart_toggle, 2),
+                (self.download_shopping_cart, 1),
+            ]
+        return zip(*scenarios)
+
+    def run(self, deadline):
+        scenarios, weights = self.scenarios()
+        try:
+            while time.monotonic() < deadline:
+                self.random.choices(scenarios, weights)[0]()
+        finally:
+            self.session.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест API: виртуальные пользователи выполняют '
+        'типовые сценарии, по каждому запросу выводятся RPS и p50/p95/p99. '
+        'Данные и пользователей создаёт generate_fake_data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--users', type=int, default=10,
+                            help='Параллельных виртуальных пользователей')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Длительность теста в секундах')
+        parser.add_argument('--anonymous', type=float, default=0.5,
+                            help='Доля анонимных пользователей')
+        parser.add_argument('--prefix', default='fake',
+                            help='Префикс пользователей generate_fake_data')
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        catalog = self.load_catalog(base_url)
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+        seed_random = random.Random(options['seed'])
+        users = []
+        for index in range(options['users']):
+            token = None
+            if seed_random.random() >= options['anonymous']:
+                token = self.login(base_url, options, index)
+            users.append(LoadTestUser(
+                self, base_url, token, catalog, seed_random.random()
+            ))
+
+        started = time.monotonic()
+        deadline = started + options['duration']
+        threads = [
+            threading.Thread(target=user.run, args=(deadline,))
+            for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.report(time.monotonic() - started)
+
+    def load_catalog(self, base_url):
+        try:
+            recipes = requests.get(
+                f'{base_url}/api/recipes/?limit=200', timeout=30
+            ).json()['results']
+            ingredients = requests.get(
+                f'{base_url}/api/ingredients/', timeout=30
+            ).json()
+        except (requests.RequestException, KeyError, ValueError) as error:
+            raise CommandError(f'Не удалось получить данные API: {error}')
+        if not recipes or not ingredients:
+            raise CommandError(
+                'В базе нет рецептов или ингредиентов: '
+                'выполните generate_fake_data'
+            )
+        return {
+            'recipes': [recipe['id'] for recipe in recipes],
+            'authors': list({recipe['author']['id'] for recipe in recipes}),
+            'titles': [recipe['name'] for recipe in recipes],
+            'ingredients': [ingredient['name'] for ingredient in ingredients],
+        }
+
+    @staticmethod
+    def login(base_url, options, index):
+        response = requests.post(
+            f'{base_url}/api/auth/token/login/',
+            json={
+                'email': f'{options["prefix"]}{index}@example.com',
+                'password': options['password'],
+            },
+            timeout=30
+        )
+        if response.status_code != 200:
+            raise CommandError(
+                f'Не удалось войти как {options["prefix"]}{index}: '
+                f'{response.status_code} {response.text}'
+            )
+        return response.json()['auth_token']
+
+    def record(self, name, elapsed, failed):
+        with self.lock:
+            self.timings[name].append(elapsed)
+            if failed:
+                self.errors[name] += 1
+
+    def report(self, elapsed):
+        total = sum(len(timings) for timings in self.timings.values())
+        self.stdout.write(
+            f'{"Запрос":<32} {"кол-во":>7} {"ошибок":>7} {"RPS":>8} '
+            f'{"p50, мс":>9} {"p95, мс":>9} {"p99, мс":>9}'
+        )
+        for name, timings in sorted(self.timings.items()):
+            timings.sort()
+            percentiles = ' '.join(
+                f'{timings[int(q * (len(timings) - 1))] * 1000:>9.1f}'
+                for q in PERCENTILES
+            )
+            self.stdout.write(
+                f'{name:<32} {len(timings):>7} {self.errors[name]:>7} '
+                f'{len(timings) / elapsed:>8.1f} {percentiles}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего {total} запросов за {elapsed:.1f} с, '
+            f'{total / elapsed:.1f} RPS, ошибок {sum(self.errors.values())}'
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import User
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного, корзин и рецептов авторов'
+
+    def handle(self, *args, **options):
+        favorites_count = count_subquery(FavoriteRecipe, 'recipe')
+        carts_count = count_subquery(ShoppingCart, 'recipe')
+        recipes_count = count_subquery(Recipe, 'creator')
+
+        with transaction.atomic():
+            repaired_recipes = Recipe.objects.exclude(
+                favorites_count=favorites_count,
+                carts_count=carts_count
+            ).update(
+                favorites_count=favorites_count,
+                carts_count=carts_count
+            )
+            repaired_users = User.objects.exclude(
+                recipes_count=recipes_count
+            ).update(recipes_count=recipes_count)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Исправлены счётчики: рецептов — {repaired_recipes}, '
+                f'пользователей — {repaired_users}'
+            )
+        )
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.scores import refresh_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинги рецептов для сортировок popular и trending. '
+        'По умолчанию добавляет события с прошлого пересчёта; --full '
+        'пересчитывает всё и учитывает удаления. Запускается по расписанию'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated, created = refresh_scores(
+            full=options['full'], batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рейтингов: {updated}, добавлено: {created} '
+            f'за {time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,266 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Recipe, RecipeIngredient
+
+# Транзакция коммитится позже, чем проставлен updated_at, поэтому при
+# синхронизации окно берётся с запасом, а уже учтённые версии рецептов
+# пропускаются.
+SYNC_OVERLAP = timedelta(minutes=5)
+# Изменения копятся в отдельном сегменте и вливаются в основной, когда
+# в нём пар больше этой доли основного (но не меньше минимума).
+DELTA_MERGE_RATIO = 0.05
+DELTA_MERGE_MIN_PAIRS = 10_000
+
+IndexArrays = namedtuple(
+    'IndexArrays',
+    ('ingredients', 'recipes', 'positions', 'recipe_ids', 'sizes')
+)
+# Основной сегмент, маска его рецептов, которые ещё актуальны,
+# и сегмент рецептов, изменённых после сборки основного.
+IndexState = namedtuple('IndexState', ('main', 'alive', 'delta'))
+
+
+def make_arrays(ingredients, recipes):
+    order = np.lexsort((recipes, ingredients))
+    ingredients, recipes = ingredients[order], recipes[order]
+    recipe_ids, positions, sizes = np.unique(
+        recipes, return_inverse=True, return_counts=True
+    )
+    return IndexArrays(
+        ingredients, recipes, positions.astype(np.int32), recipe_ids, sizes
+    )
+
+
+def make_state(arrays):
+    return IndexState(
+        arrays,
+        np.ones(len(arrays.recipe_ids), dtype=bool),
+        make_arrays(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+    )
+
+
+def compact(state):
+    """Один сегмент из основного без устаревших рецептов и изменённых."""
+    keep = state.alive[state.main.positions]
+    return make_state(make_arrays(
+        np.concatenate(
+            (state.main.ingredients[keep], state.delta.ingredients)
+        ),
+        np.concatenate((state.main.recipes[keep], state.delta.recipes))
+    ))
+
+
+def segment_matches(arrays, queried, max_missing, alive=None):
+    """(id, доля, число недостающих) рецептов сегмента для запроса."""
+    starts = np.searchsorted(arrays.ingredients, queried, side='left')
+    ends = np.searchsorted(arrays.ingredients, queried, side='right')
+    postings = [
+        arrays.positions[start:end] for start, end in zip(starts, ends)
+        if end > start
+    ]
+    if not postings:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.astype(float), empty
+    hits = np.bincount(
+        np.concatenate(postings), minlength=len(arrays.sizes)
+    )
+    missing = arrays.sizes - hits
+    selected = (hits > 0) & (missing <= max_missing)
+    if alive is not None:
+        selected &= alive
+    candidates = np.flatnonzero(selected)
+    return (
+        arrays.recipe_ids[candidates],
+        hits[candidates] / arrays.sizes[candidates],
+        missing[candidates],
+    )
+
+
+class RecipeMatchIndex:
+    """Инвертированный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Пары (ингредиент, рецепт) лежат в двух выровненных массивах,
+    отсортированных по ингредиенту: список рецептов ингредиента — срез,
+    найденный двоичным поиском. Рецепт в списках хранится номером в
+    отсортированном массиве id, поэтому совпадения по рецептам считаются
+    одним np.bincount без сортировки, а стоимость запроса зависит от
+    длины списков ингредиентов пользователя.
+
+    Изменения не пересортировывают весь индекс: рецепт, изменённый или
+    удалённый после сборки, гасится маской alive основного сегмента,
+    а его новые пары попадают в небольшой сегмент delta. Сегменты
+    сливаются, когда delta вырастает до DELTA_MERGE_RATIO основного.
+
+    Рецепты, чьи ингредиенты поменялись в этом процессе, учитываются
+    в следующем же запросе. Изменения из других воркеров индекс ищет
+    по Recipe.updated_at не чаще раза в RECIPE_MATCH_SYNC_INTERVAL
+    секунд и без ожидания: пока один поток проверяет базу, остальные
+    отвечают по текущему состоянию. Рецепты, удалённые в других
+    воркерах, view помечает изменёнными, когда не находит их в базе.
+    Полностью индекс перестраивается раз в RECIPE_MATCH_INDEX_TTL секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # mark_changed не ждёт сборки, поэтому у очереди свой замок.
+        self._pending_lock = threading.Lock()
+        self._pending = set()
+        self._applied = {}
+        self._built_at = None
+        self._synced_at = None
+        self._checked_at = None
+        self._state = make_state(make_arrays(
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        ))
+
+    def invalidate(self):
+        self._built_at = None
+
+    def mark_changed(self, recipe_id):
+        with self._pending_lock:
+            self._pending.add(recipe_id)
+
+    def _take_pending(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, set()
+        return pending
+
+    def _is_stale(self):
+        return (
+            self._built_at is None
+            or time.monotonic() - self._built_at
+            > settings.RECIPE_MATCH_INDEX_TTL
+        )
+
+    def _sync_due(self):
+        return (
+            time.monotonic() - self._checked_at
+            > settings.RECIPE_MATCH_SYNC_INTERVAL
+        )
+
+    @staticmethod
+    def _load_pairs(queryset):
+        pairs = np.fromiter(
+            (
+                value
+                for pair in queryset.values_list(
+                    'ingredient_id', 'recipe_id'
+                ).order_by().iterator(chunk_size=10_000)
+                for value in pair
+            ),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        return pairs[:, 0], pairs[:, 1]
+
+    def _build(self):
+        self._take_pending()
+        self._applied = {}
+        synced_at = timezone.now()
+        self._state = make_state(
+            make_arrays(*self._load_pairs(RecipeIngredient.objects.all()))
+        )
+        self._synced_at = synced_at
+        self._built_at = self._checked_at = time.monotonic()
+
+    def _sync(self):
+        synced_at = timezone.now()
+        versions = dict(Recipe.objects.filter(
+            updated_at__gte=self._synced_at - SYNC_OVERLAP
+        ).values_list('pk', 'updated_at'))
+        changed = {
+            pk for pk, updated_at in versions.items()
+            if self._applied.get(pk) != updated_at
+        }
+        self._applied = versions
+        changed |= self._take_pending()
+        if changed:
+            self._apply(changed)
+        self._synced_at = synced_at
+        self._checked_at = time.monotonic()
+
+    def _apply(self, changed):
+        state = self._state
+        changed_ids = np.sort(np.fromiter(changed, dtype=np.int64))
+
+        recipe_ids = state.main.recipe_ids
+        indexes = np.searchsorted(recipe_ids, changed_ids)
+        indexes = indexes[indexes < len(recipe_ids)]
+        indexes = indexes[np.isin(recipe_ids[indexes], changed_ids)]
+        alive = state.alive.copy()
+        alive[indexes] = False
+
+        keep = ~np.isin(state.delta.recipes, changed_ids)
+        new_ingredients, new_recipes = self._load_pairs(
+            RecipeIngredient.objects.filter(recipe_id__in=changed)
+        )
+        state = IndexState(state.main, alive, make_arrays(
+            np.concatenate((state.delta.ingredients[keep], new_ingredients)),
+            np.concatenate((state.delta.recipes[keep], new_recipes))
+        ))
+        if len(state.delta.ingredients) > max(
+            DELTA_MERGE_MIN_PAIRS,
+            len(state.main.ingredients) * DELTA_MERGE_RATIO
+        ):
+            state = compact(state)
+        self._state = state
+
+    def _ensure_fresh(self):
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self._build()
+        elif self._pending:
+            # Свои изменения должны быть видны сразу, поэтому ждём.
+            with self._lock:
+                self._sync()
+        elif self._sync_due() and self._lock.acquire(blocking=False):
+            try:
+                self._sync()
+            finally:
+                self._lock.release()
+        return self._state
+
+    def snapshot(self):
+        """Актуальные массивы индекса одним неизменяемым IndexArrays.
+
+        Если после сборки были изменения, сегменты сливаются.
+        """
+        state = self._ensure_fresh()
+        if len(state.delta.recipe_ids) or not state.alive.all():
+            with self._lock:
+                state = self._state
+                if len(state.delta.recipe_ids) or not state.alive.all():
+                    state = self._state = compact(state)
+        return state.main
+
+    def match(self, ingredient_ids, max_missing, limit):
+        """Рецепты по убыванию доли ингредиентов, которые есть у пользователя.
+
+        Возвращает список (id рецепта, доля, число недостающих) не длиннее
+        limit; рецепты, где недостаёт больше max_missing, отбрасываются.
+        """
+        state = self._ensure_fresh()
+        queried = np.unique(np.fromiter(ingredient_ids, dtype=np.int64))
+        matched, coverage, missing = (
+            np.concatenate(values) for values in zip(
+                segment_matches(
+                    state.main, queried, max_missing, state.alive
+                ),
+                segment_matches(state.delta, queried, max_missing),
+            )
+        )
+        order = np.lexsort((-matched, missing, -coverage))[:limit]
+        return [
+            (int(matched[index]), float(coverage[index]), int(missing[index]))
+            for index in order
+        ]
+
+
+recipe_match_index = RecipeMatchIndex()
@@ -0,0 +1,22 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from recipes.operations import RunPostgreSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        RunPostgreSQL(
+            sql=(
+                'CREATE INDEX IF NOT EXISTS recipes_ingredient_title_trgm '
+                'ON recipes_ingredientmodel USING gin (title gin_trgm_ops);'
+            ),
+            reverse_sql='DROP INDEX IF EXISTS recipes_ingredient_title_trgm;',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-publication_date', '-id'], name='recipe_publication_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:40
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+# models.MAX_AMOUNT на момент миграции: сумма объединённых строк не должна
+# выходить за валидатор поля.
+MAX_AMOUNT = 32_000
+
+
+def merge_duplicates(apps, schema_editor):
+    IngredientModel = apps.get_model('recipes', 'IngredientModel')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = IngredientModel.objects.values(
+        'title', 'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        extra_ids = list(IngredientModel.objects.filter(
+            title=duplicate['title'],
+            measurement_unit=duplicate['measurement_unit']
+        ).exclude(pk=duplicate['keep_id']).values_list('id', flat=True))
+        for amount in RecipeIngredient.objects.filter(
+            ingredient_id__in=extra_ids
+        ):
+            kept, created = RecipeIngredient.objects.get_or_create(
+                recipe_id=amount.recipe_id,
+                ingredient_id=duplicate['keep_id'],
+                defaults={'quantity': amount.quantity}
+            )
+            if not created:
+                kept.quantity = min(
+                    kept.quantity + amount.quantity, MAX_AMOUNT
+                )
+                kept.save(update_fields=['quantity'])
+            amount.delete()
+        IngredientModel.objects.filter(pk__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_ingredientmodel_updated_at_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
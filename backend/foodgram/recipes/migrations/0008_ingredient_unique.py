@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_merge_duplicate_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ingredientmodel',
+            constraint=models.UniqueConstraint(fields=('title', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,161 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:44
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from recipes.operations import RunPostgreSQL
+
+# Вес A — название, B — ингредиенты, C — описание; каждая часть
+# индексируется и русской, и английской конфигурацией.
+SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION recipes_search_vector(
+    target_id bigint, recipe_title text, recipe_description text
+) RETURNS tsvector AS $$
+DECLARE
+    ingredients text;
+BEGIN
+    SELECT string_agg(ingredient.title, ' ') INTO ingredients
+    FROM recipes_recipeingredient AS amount
+    JOIN recipes_ingredientmodel AS ingredient
+        ON ingredient.id = amount.ingredient_id
+    WHERE amount.recipe_id = target_id;
+    RETURN
+        setweight(to_tsvector('russian', coalesce(recipe_title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(recipe_title, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(ingredients, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(ingredients, '')), 'B')
+        || setweight(to_tsvector('russian', coalesce(recipe_description, '')), 'C')
+        || setweight(to_tsvector('english', coalesce(recipe_description, '')), 'C');
+END;
+$$ LANGUAGE plpgsql STABLE;
+"""
+
+RECIPE_TRIGGER = """
+CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_trigger()
+RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := recipes_search_vector(
+        NEW.id, NEW.title, NEW.description
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recipes_recipe_search_vector
+BEFORE INSERT OR UPDATE OF title, description ON recipes_recipe
+FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_trigger();
+"""
+
+# Триггеры на уровне оператора: bulk_create десяти ингредиентов
+# пересчитывает вектор рецепта один раз, а не десять.
+RECIPE_INGREDIENT_TRIGGERS = """
+CREATE OR REPLACE FUNCTION recipes_recipeingredient_search_vector_trigger()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE recipes_recipe AS recipe SET search_vector =
+            recipes_search_vector(recipe.id, recipe.title, recipe.description)
+        WHERE recipe.id IN (SELECT recipe_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE recipes_recipe AS recipe SET search_vector =
+            recipes_search_vector(recipe.id, recipe.title, recipe.description)
+        WHERE recipe.id IN (SELECT recipe_id FROM old_rows);
+    ELSE
+        UPDATE recipes_recipe AS recipe SET search_vector =
+            recipes_search_vector(recipe.id, recipe.title, recipe.description)
+        WHERE recipe.id IN (
+            SELECT recipe_id FROM new_rows
+            UNION SELECT recipe_id FROM old_rows
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recipes_recipeingredient_search_vector_insert
+AFTER INSERT ON recipes_recipeingredient
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_recipeingredient_search_vector_trigger();
+
+CREATE TRIGGER recipes_recipeingredient_search_vector_update
+AFTER UPDATE ON recipes_recipeingredient
+REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_recipeingredient_search_vector_trigger();
+
+CREATE TRIGGER recipes_recipeingredient_search_vector_delete
+AFTER DELETE ON recipes_recipeingredient
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_recipeingredient_search_vector_trigger();
+"""
+
+INGREDIENT_TRIGGER = """
+CREATE OR REPLACE FUNCTION recipes_ingredientmodel_search_vector_trigger()
+RETURNS trigger AS $$
+BEGIN
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        recipes_search_vector(recipe.id, recipe.title, recipe.description)
+    WHERE recipe.id IN (
+        SELECT recipe_id FROM recipes_recipeingredient
+        WHERE ingredient_id = NEW.id
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recipes_ingredientmodel_search_vector
+AFTER UPDATE OF title ON recipes_ingredientmodel
+FOR EACH ROW WHEN (OLD.title IS DISTINCT FROM NEW.title)
+EXECUTE FUNCTION recipes_ingredientmodel_search_vector_trigger();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_picture_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        RunPostgreSQL(
+            sql=[
+                SEARCH_VECTOR_FUNCTION,
+                RECIPE_TRIGGER,
+                RECIPE_INGREDIENT_TRIGGERS,
+                INGREDIENT_TRIGGER,
+                'UPDATE recipes_recipe SET search_vector = '
+                'recipes_search_vector(id, title, description);',
+                'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin '
+                'ON recipes_recipe USING gin (search_vector);',
+            ],
+            reverse_sql=[
+                'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin;',
+                'DROP TRIGGER IF EXISTS recipes_ingredientmodel_search_vector '
+                'ON recipes_ingredientmodel;',
+                'DROP TRIGGER IF EXISTS '
+                'recipes_recipeingredient_search_vector_insert '
+                'ON recipes_recipeingredient;',
+                'DROP TRIGGER IF EXISTS '
+                'recipes_recipeingredient_search_vector_update '
+                'ON recipes_recipeingredient;',
+                'DROP TRIGGER IF EXISTS '
+                'recipes_recipeingredient_search_vector_delete '
+                'ON recipes_recipeingredient;',
+                'DROP TRIGGER IF EXISTS recipes_recipe_search_vector '
+                'ON recipes_recipe;',
+                'DROP FUNCTION IF EXISTS '
+                'recipes_ingredientmodel_search_vector_trigger();',
+                'DROP FUNCTION IF EXISTS '
+                'recipes_recipeingredient_search_vector_trigger();',
+                'DROP FUNCTION IF EXISTS recipes_recipe_search_vector_trigger();',
+                'DROP FUNCTION IF EXISTS recipes_search_vector(bigint, text, text);',
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_similar_recipes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['creator', '-publication_date', '-id'], name='recipe_creator_pub_idx'),
+        ),
+    ]
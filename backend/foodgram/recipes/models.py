@@ -1,12 +1,22 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator,MaxValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models import Exists, F, OuterRef, Value
+from django.db.models.functions import Now
 from django.urls import reverse
 
 User = get_user_model()
 MIN_AMOUNT = 1
 MAX_AMOUNT = 32_000
 
+
+def update_counter(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
 class IngredientModel(models.Model):
     title = models.CharField(max_length=256, verbose_name='Название')
     measurement_unit = models.CharField(
@@ -14,9 +24,19 @@ class IngredientModel(models.Model):
         max_length=30,
         verbose_name='Единица измерения'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         ordering = ['title']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['title', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -24,6 +44,24 @@ class IngredientModel(models.Model):
         return f'{self.title} ({self.measurement_unit})'
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        if not user or not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False)
+            )
+        return self.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                recipe=OuterRef('pk'), owner=user
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                recipe=OuterRef('pk'), owner=user
+            ))
+        )
+
+
 class Recipe(models.Model):
     title = models.CharField(max_length=256, verbose_name='Название')
     description = models.TextField(verbose_name='Описание')
@@ -38,6 +76,12 @@ class Recipe(models.Model):
         upload_to='recipe_images/',
         verbose_name='Изображение'
     )
+    picture_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения'
+    )
     creator = models.ForeignKey(
         User,
         related_name='created_recipes',
@@ -55,9 +99,41 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-publication_date']
+        indexes = [
+            models.Index(
+                fields=['-publication_date', '-id'],
+                name='recipe_publication_idx'
+            ),
+            models.Index(fields=['updated_at'], name='recipe_updated_idx'),
+            models.Index(
+                fields=['creator', '-publication_date', '-id'],
+                name='recipe_creator_pub_idx'
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -103,6 +179,58 @@ class RecipeIngredient(models.Model):
         return f'{self.ingredient} в рецепте {self.recipe}'
 
 
+class UserRecipeQuerySet(models.QuerySet):
+
+    def add(self, owner, recipe):
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (owner_id, recipe_id) VALUES (%s, %s) '
+                'ON CONFLICT DO NOTHING RETURNING id',
+                [owner.pk, recipe.pk]
+            )
+            return cursor.fetchone() is not None
+
+    def remove(self, owner, recipe_id):
+        deleted_count, _ = self.filter(
+            owner=owner, recipe_id=recipe_id
+        ).delete()
+        return deleted_count > 0
+
+    def add_many(self, owner, recipe_ids):
+        """Добавляет рецепты одним INSERT и возвращает id вставленных."""
+        if not recipe_ids:
+            return set()
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        values = ', '.join(['(%s, %s)'] * len(recipe_ids))
+        params = [
+            value
+            for recipe_id in recipe_ids
+            for value in (owner.pk, recipe_id)
+        ]
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (owner_id, recipe_id) VALUES {values} '
+                'ON CONFLICT DO NOTHING RETURNING recipe_id',
+                params
+            )
+            return {recipe_id for recipe_id, in cursor.fetchall()}
+
+    def remove_many(self, owner, recipe_ids):
+        """Удаляет рецепты одним DELETE и возвращает id удалённых."""
+        if not recipe_ids:
+            return set()
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE owner_id = %s '
+                f'AND recipe_id IN ({placeholders}) RETURNING recipe_id',
+                [owner.pk, *recipe_ids]
+            )
+            return {recipe_id for recipe_id, in cursor.fetchall()}
+
+
 class ShoppingCart(models.Model):
     owner = models.ForeignKey(
         User,
@@ -116,6 +244,14 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт'
     )
+    # У строк, добавленных до появления поля, даты нет.
+    created_at = models.DateTimeField(
+        db_default=Now(),
+        null=True,
+        verbose_name='Дата добавления'
+    )
+
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['owner', 'recipe']
@@ -125,6 +261,9 @@ class ShoppingCart(models.Model):
                 name='unique_recipe_in_cart'
             )
         ]
+        indexes = [
+            models.Index(fields=['created_at'], name='cart_created_idx')
+        ]
         verbose_name = 'Корзина покупок'
         verbose_name_plural = 'Корзины покупок'
 
@@ -145,6 +284,14 @@ class FavoriteRecipe(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт'
     )
+    # У строк, добавленных до появления поля, даты нет.
+    created_at = models.DateTimeField(
+        db_default=Now(),
+        null=True,
+        verbose_name='Дата добавления'
+    )
+
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['owner', 'recipe']
@@ -154,8 +301,94 @@ class FavoriteRecipe(models.Model):
                 name='unique_favorite_recipe'
             )
         ]
+        indexes = [
+            models.Index(fields=['created_at'], name='favorite_created_idx')
+        ]
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
 
     def __str__(self):
-        return f'{self.recipe} в избранном у {self.owner}'
\ No newline at end of file
+        return f'{self.recipe} в избранном у {self.owner}'
+
+
+class RecipeScore(models.Model):
+    """Рейтинги рецепта для сортировок ?ordering=popular и trending.
+
+    Хранится log2(1 + Σ w·2^((t − SCORE_EPOCH) / h)) по добавлениям
+    в избранное и корзину: вклад события растёт со временем, поэтому
+    старые строки не нужно пересчитывать — затухание заложено в шкалу.
+    Заполняется командой refresh_recipe_scores.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name='score',
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт'
+    )
+    popular = models.FloatField(default=0, verbose_name='Популярность')
+    trending = models.FloatField(default=0, verbose_name='Тренд')
+    refreshed_at = models.DateTimeField(
+        null=True,
+        verbose_name='Дата пересчёта'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-popular', '-recipe'], name='recipe_score_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending', '-recipe'],
+                name='recipe_score_trending_idx'
+            ),
+            models.Index(
+                fields=['refreshed_at'], name='recipe_score_refreshed_idx'
+            ),
+        ]
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+    def __str__(self):
+        return f'Рейтинг рецепта {self.recipe_id}'
+
+
+class SimilarRecipe(models.Model):
+    """Заранее посчитанный список похожих рецептов.
+
+    Строится командой build_similar_recipes и пересчитывается для рецепта
+    в фоне после его сохранения.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='similar',
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        related_name='similar_for',
+        on_delete=models.CASCADE,
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Близость')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'], name='similar_recipe_score_idx'
+            )
+        ]
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.similar_id} похож на {self.recipe_id}'
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class RunPostgreSQL(migrations.RunSQL):
+    """RunSQL, которая выполняется только на PostgreSQL.
+
+    Индексы на расширениях PostgreSQL (pg_trgm, tsvector) не описываются
+    в Meta.indexes: SQLite при пересборке таблицы попытался бы создать их
+    заново и упал бы. Локальная разработка на SQLite их просто пропускает.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
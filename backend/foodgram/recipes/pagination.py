@@ -0,0 +1,127 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import RANKED_ORDERINGS
+
+
+class RecipePagination(LimitOffsetPagination):
+    """limit/offset по умолчанию и keyset-пагинация по запросу.
+
+    Параметр ?cursor= (пустой для первой страницы) включает выборку по
+    ключу (publication_date, id): следующая страница начинается сразу
+    за последней записью предыдущей, поэтому её стоимость не зависит
+    от глубины. COUNT(*) в этом режиме выполняется только с ?with_count=true.
+    Сортировки по рейтингу (?ordering=popular) листаются limit/offset.
+    ?limit больше max_limit урезается до max_limit.
+    """
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    invalid_cursor_message = 'Некорректный курсор.'
+    ordering = ('-publication_date', '-id')
+    max_limit = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            self.cursor_query_param in request.query_params
+            and request.query_params.get('ordering') not in RANKED_ORDERINGS
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        queryset = queryset.order_by(*self.ordering)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = self.get_count(queryset)
+
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        if position is not None:
+            publication_date, pk = position
+            queryset = queryset.filter(
+                Q(publication_date__lt=publication_date)
+                | Q(publication_date=publication_date, pk__lt=pk)
+            )
+
+        page = list(queryset[:self.limit + 1])
+        self.next_position = None
+        if len(page) > self.limit:
+            page = page[:self.limit]
+            self.next_position = (page[-1].publication_date, page[-1].pk)
+        return page
+
+    def paginate_positions(self, request, get_positions):
+        """Keyset-страница по позициям (publication_date, id).
+
+        Для выдач, которые собираются не одним запросом, как лента
+        подписок: get_positions(position, count) возвращает count позиций
+        строго после курсора.
+        """
+        self.request = request
+        self.use_cursor = True
+        self.count = None
+        self.limit = self.get_limit(request)
+        positions = get_positions(
+            self.decode_cursor(
+                request.query_params.get(self.cursor_query_param, '')
+            ),
+            self.limit + 1
+        )
+        self.next_position = None
+        if len(positions) > self.limit:
+            positions = positions[:self.limit]
+            self.next_position = tuple(positions[-1])
+        return positions
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        response = {'next': self.get_next_cursor_link()}
+        if self.count is not None:
+            response['count'] = self.count
+        response['results'] = data
+        return Response(response)
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.count_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    @staticmethod
+    def encode_cursor(position):
+        publication_date, pk = position
+        token = f'{publication_date.isoformat()}|{pk}'
+        return urlsafe_b64encode(token.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            token = urlsafe_b64decode(cursor.encode()).decode()
+            publication_date, pk = token.split('|')
+            publication_date = parse_datetime(publication_date)
+            pk = int(pk)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if publication_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return publication_date, pk
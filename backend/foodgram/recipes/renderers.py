@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import renderers
+
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+
+
+class ShoppingListTextRenderer(renderers.BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            return self.render_message(data)
+        return b''.join(self.stream(data))
+
+    def render_message(self, data):
+        return ''.join(
+            f'{key}: {value}\n' for key, value in data.items()
+        ).encode(self.charset)
+
+    def format_item(self, item):
+        return (
+            f"{item['name']} - {item['amount']} "
+            f"{item['measurement_unit']}"
+        )
+
+    def stream(self, items):
+        for item in items:
+            yield f'{self.format_item(item)}\n'.encode(self.charset)
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    class Echo:
+        def write(self, value):
+            return value
+
+    def stream(self, items):
+        writer = csv.writer(self.Echo())
+        yield writer.writerow(
+            ('name', 'measurement_unit', 'amount')
+        ).encode(self.charset)
+        for item in items:
+            yield writer.writerow((
+                item['name'], item['measurement_unit'], item['amount']
+            )).encode(self.charset)
+
+
+class ShoppingListJSONRenderer(ShoppingListTextRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def render_message(self, data):
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+    def stream(self, items):
+        separator = '['
+        for item in items:
+            yield (separator + json.dumps(
+                item, ensure_ascii=False
+            )).encode(self.charset)
+            separator = ','
+        yield ('[]' if separator == '[' else ']').encode(self.charset)
+
+
+class ShoppingListPDFRenderer(ShoppingListTextRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def render_message(self, data):
+        return b''.join(self.stream_lines(
+            f'{key}: {value}' for key, value in data.items()
+        ))
+
+    def stream(self, items):
+        return self.stream_lines(self.format_item(item) for item in items)
+
+    def stream_lines(self, lines):
+        # В трейлере PDF нужны смещения всех объектов, поэтому документ
+        # собирается в памяти и отдаётся одним куском.
+        font_name = self.get_font_name()
+        buffer = BytesIO()
+        document = canvas.Canvas(buffer, pagesize=A4)
+        _, height = A4
+        y = height - PDF_MARGIN
+        document.setFont(font_name, PDF_FONT_SIZE)
+        for line in lines:
+            if y < PDF_MARGIN:
+                document.showPage()
+                document.setFont(font_name, PDF_FONT_SIZE)
+                y = height - PDF_MARGIN
+            document.drawString(PDF_MARGIN, y, line)
+            y -= PDF_FONT_SIZE * 1.5
+        document.save()
+        yield buffer.getvalue()
+
+    @staticmethod
+    def get_font_name():
+        if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+            return PDF_FONT_NAME
+        font_path = settings.SHOPPING_LIST_PDF_FONT
+        if not os.path.exists(font_path):
+            return 'Helvetica'
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+        return PDF_FONT_NAME
+
+
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+    ShoppingListPDFRenderer,
+)
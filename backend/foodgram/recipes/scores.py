@@ -0,0 +1,121 @@
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import recipe_cache
+from .models import FavoriteRecipe, Recipe, RecipeScore, ShoppingCart
+
+SCORE_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+SCORE_FIELDS = ('popular', 'trending', 'refreshed_at')
+
+
+def log2_add(a, b):
+    """log2(2^a + 2^b) без переполнения при больших показателях."""
+    high, low = (a, b) if a >= b else (b, a)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def event_scores(created_at, weight):
+    hours = (created_at - SCORE_EPOCH).total_seconds() / 3600
+    log_weight = math.log2(weight)
+    return (
+        log_weight + hours / settings.RECIPE_POPULAR_HALF_LIFE,
+        log_weight + hours / settings.RECIPE_TRENDING_HALF_LIFE,
+    )
+
+
+def add_event(totals, recipe_id, scores):
+    """Прибавляет вклад события; None — нет вклада в эту шкалу."""
+    current = totals.get(recipe_id, (None, None))
+    totals[recipe_id] = tuple(
+        new if old is None else old if new is None else log2_add(old, new)
+        for old, new in zip(current, scores)
+    )
+
+
+def collect_events(since, until, chunk_size):
+    """Вклад событий из (since, until] по рецептам в логарифмической шкале.
+
+    При полном пересчёте (since=None) учитываются и события без даты —
+    добавленные до появления created_at. Их время неизвестно, поэтому
+    в популярность они идут с датой публикации рецепта, а в тренд
+    не идут вовсе: иначе все они выглядели бы свежими.
+    """
+    totals = {}
+    sources = (
+        (FavoriteRecipe, settings.RECIPE_SCORE_WEIGHTS['favorite']),
+        (ShoppingCart, settings.RECIPE_SCORE_WEIGHTS['cart']),
+    )
+    for model, weight in sources:
+        events = model.objects.filter(created_at__lte=until)
+        if since is not None:
+            events = events.filter(created_at__gt=since)
+        for recipe_id, created_at in events.values_list(
+            'recipe_id', 'created_at'
+        ).order_by().iterator(chunk_size=chunk_size):
+            add_event(totals, recipe_id, event_scores(created_at, weight))
+        if since is not None:
+            continue
+        for recipe_id, published_at in model.objects.filter(
+            created_at__isnull=True
+        ).values_list(
+            'recipe_id', 'recipe__publication_date'
+        ).order_by().iterator(chunk_size=chunk_size):
+            popular, _ = event_scores(published_at, weight)
+            add_event(totals, recipe_id, (popular, None))
+    return totals
+
+
+def refresh_scores(full=False, batch_size=1000):
+    """Досчитывает рейтинги по событиям с прошлого пересчёта.
+
+    Вклад каждого события в шкале RecipeScore не меняется со временем,
+    поэтому достаточно прибавить новые события к строкам затронутых
+    рецептов. Удаления из избранного и корзины, а также события из
+    транзакций, закоммиченных после пересчёта с более ранней датой,
+    учитываются только полным пересчётом (full=True) — его стоит
+    запускать реже, например раз в сутки.
+    Возвращает число обновлённых и добавленных строк.
+    """
+    now = timezone.now()
+    since = None
+    if not full:
+        since = RecipeScore.objects.aggregate(
+            since=Max('refreshed_at')
+        )['since']
+        full = since is None
+    totals = collect_events(since, now, batch_size)
+
+    with transaction.atomic():
+        if full:
+            RecipeScore.objects.update(popular=0, trending=0, refreshed_at=now)
+        missing = Recipe.objects.filter(
+            score__isnull=True
+        ).values_list('pk', flat=True)
+        created = len(RecipeScore.objects.bulk_create(
+            [RecipeScore(recipe_id=pk, refreshed_at=now) for pk in missing],
+            batch_size=batch_size,
+            ignore_conflicts=True
+        ))
+
+        recipe_ids = list(totals)
+        updated = 0
+        for start in range(0, len(recipe_ids), batch_size):
+            scores = RecipeScore.objects.in_bulk(
+                recipe_ids[start:start + batch_size]
+            )
+            for recipe_id, score in scores.items():
+                popular, trending = totals[recipe_id]
+                score.popular = log2_add(score.popular, popular)
+                if trending is not None:
+                    score.trending = log2_add(score.trending, trending)
+                score.refreshed_at = now
+            updated += RecipeScore.objects.bulk_update(
+                scores.values(), SCORE_FIELDS
+            )
+        transaction.on_commit(recipe_cache.invalidate_lists)
+    return updated, created
@@ -1,25 +1,32 @@
-from base64 import b64decode
-import uuid
-
-from django.core.files.base import ContentFile
-from django.core.paginator import Paginator
 from rest_framework import serializers
 
 from .models import Recipe, IngredientModel, RecipeIngredient
-from users.serializers import UsersSerializer
+from api.fields import ImageBase64Field
+from users.serializers import SubscriptionsListSerializer, UsersSerializer
 
 
 MIN_AMOUNT = 1
 MAX_AMOUNT = 32000
-
-class ImageBase64Field(serializers.ImageField):
-    def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format_part, image_string = data.split(';base64,')
-            extension = format_part.split('/')[-1]
-            file_name = f"recipe_img_{uuid.uuid4().hex[:10]}.{extension}"
-            data = ContentFile(b64decode(image_string), name=file_name)
-        return super().to_internal_value(data)
+MAX_BULK_RECIPES = 100
+MAX_MATCH_INGREDIENTS = 200
+MAX_MATCH_RESULTS = 100
+
+
+def get_recipes_limit(request):
+    if request is None:
+        return None
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        recipes_limit = 0
+    if recipes_limit < 1:
+        raise serializers.ValidationError({
+            'recipes_limit': 'Значение должно быть целым положительным числом!'
+        })
+    return recipes_limit
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -50,8 +57,9 @@ class RecipeIngredientCreateSerializer(serializers.Serializer):
     )
 
 class RecipeSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='title', max_length=256)
+    text = serializers.CharField(source='description')
     cooking_time = serializers.IntegerField(
-        source='cooking_time',
         min_value=MIN_AMOUNT,
         max_value=MAX_AMOUNT,
         error_messages={
@@ -59,27 +67,29 @@ class RecipeSerializer(serializers.ModelSerializer):
             'max_value': f'Время приготовления не может превышать {MAX_AMOUNT} минут!'
         }
     )
-    creator = UsersSerializer(source='creator', read_only=True)
+    creator = UsersSerializer(read_only=True)
     components = serializers.SerializerMethodField()
-    picture = ImageBase64Field(source='picture', required=True)
+    image = ImageBase64Field(
+        source='picture', required=True, file_prefix='recipe_img',
+        variant='full', variants_field='picture_variants'
+    )
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
 
+    subscription_user_field = 'creator'
+
     class Meta:
         model = Recipe
         fields = (
             'id', 'creator', 'components', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'picture', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
         )
         read_only_fields = ('is_favorited', 'is_in_shopping_cart', 'creator')
+        list_serializer_class = SubscriptionsListSerializer
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['name'] = instance.title
-        representation['text'] = instance.description
-        representation['cooking_time'] = instance.cooking_time
         representation['author'] = representation.pop('creator')
-        representation['image'] = representation.pop('picture')
         representation['ingredients'] = RecipeIngredientSerializer(
             instance.ingredient_amounts.all(), many=True
         ).data
@@ -120,12 +130,16 @@ class RecipeSerializer(serializers.ModelSerializer):
         return value
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
         return obj.favorited_by.filter(owner=request.user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
@@ -139,11 +153,11 @@ class RecipeSerializer(serializers.ModelSerializer):
             )
 
         recipe_data = {
-            'title': validated_data.get('name', ''),
-            'description': validated_data.get('text', ''),
-            'cooking_time': validated_data.get('cooking_time', validated_data.get('cooking_time')),
-            'picture': validated_data.get('image', validated_data.get('picture')),
-            'creator': validated_data.get('author', validated_data.get('creator'))
+            'title': validated_data.get('title', ''),
+            'description': validated_data.get('description', ''),
+            'cooking_time': validated_data.get('cooking_time'),
+            'picture': validated_data.get('picture'),
+            'creator': validated_data.get('creator')
         }
         
         recipe = Recipe.objects.create(**recipe_data)
@@ -157,14 +171,14 @@ class RecipeSerializer(serializers.ModelSerializer):
                 'Поле ингредиентов обязательно для заполнения!'
             )
 
-        if 'name' in validated_data:
-            instance.title = validated_data['name']
-        if 'text' in validated_data:
-            instance.description = validated_data['text']
+        if 'title' in validated_data:
+            instance.title = validated_data['title']
+        if 'description' in validated_data:
+            instance.description = validated_data['description']
         if 'cooking_time' in validated_data:
             instance.cooking_time = validated_data['cooking_time']
-        if 'image' in validated_data:
-            instance.picture = validated_data['image']
+        if 'picture' in validated_data:
+            instance.picture = validated_data['picture']
             
         instance.save()
 
@@ -208,7 +222,9 @@ class RecipeSerializer(serializers.ModelSerializer):
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='ingredient.id')
     name = serializers.CharField(source='ingredient.title')
-    measurement_unit = serializers.CharField(source='measurement_unit')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
     amount = serializers.IntegerField(
         source='quantity',
         min_value=1,
@@ -223,17 +239,50 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class CompactRecipeSerializer(serializers.ModelSerializer):
-    image = ImageBase64Field(source='picture', required=True)
+    name = serializers.CharField(source='title', read_only=True)
+    image = ImageBase64Field(
+        source='picture', required=True, file_prefix='recipe_img',
+        variant='thumbnail', variants_field='picture_variants'
+    )
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
-        
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['name'] = instance.title
-        representation['cooking_time'] = instance.cooking_time
-        return representation
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES,
+        error_messages={
+            'empty': 'Необходимо указать хотя бы один рецепт!',
+            'max_length': (
+                f'Можно передать не более {MAX_BULK_RECIPES} рецептов!'
+            )
+        }
+    )
+
+
+class RecipeMatchSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_MATCH_INGREDIENTS,
+        error_messages={
+            'empty': 'Необходимо указать хотя бы один ингредиент!',
+            'max_length': (
+                f'Можно передать не более {MAX_MATCH_INGREDIENTS} '
+                'ингредиентов!'
+            )
+        }
+    )
+    max_missing = serializers.IntegerField(
+        min_value=0, max_value=MAX_AMOUNT, default=2
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=MAX_MATCH_RESULTS, default=20
+    )
 
 
 class FollowingSerializer(UsersSerializer):
@@ -244,18 +293,16 @@ class FollowingSerializer(UsersSerializer):
         fields = [*UsersSerializer.Meta.fields, 'recipes', 'recipes_count']
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes = obj.created_recipes.all()
-
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit:
-            recipes_limit = int(recipes_limit)
-            paginator = Paginator(recipes, recipes_limit)
-            recipes = paginator.page(1).object_list
+        recipes = getattr(obj, 'recipe_previews', None)
+        if recipes is None:
+            recipes = obj.created_recipes.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit:
+                recipes = recipes[:recipes_limit]
 
         return CompactRecipeSerializer(
             recipes, many=True, context=self.context
         ).data
 
     def get_recipes_count(self, obj):
-        return obj.created_recipes.count()
\ No newline at end of file
+        return obj.recipes_count
@@ -0,0 +1,86 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import ingredient_index
+from .cache import recipe_cache
+from .feed import feed_cache
+from .matching import recipe_match_index
+from .models import IngredientModel, Recipe, RecipeIngredient
+from api.images import schedule_variants, variants_ready
+from users.models import Follow, User
+
+
+@receiver((post_save, post_delete), sender=IngredientModel)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+    transaction.on_commit(recipe_cache.invalidate_all)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_cache(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(recipe_cache.invalidate_recipe, instance.pk)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_picture_variants(sender, instance, **kwargs):
+    schedule_variants(instance, 'picture', 'picture_variants')
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar_variants(sender, instance, **kwargs):
+    schedule_variants(instance, 'profile_picture', 'avatar_variants')
+
+
+@receiver(variants_ready, sender=Recipe)
+def invalidate_recipe_picture_cache(sender, pk, **kwargs):
+    recipe_cache.invalidate_recipe(pk)
+
+
+@receiver(variants_ready, sender=User)
+def invalidate_avatar_cache(sender, **kwargs):
+    recipe_cache.invalidate_all()
+
+
+# RecipeSerializer пишет ингредиенты через bulk_create без сигналов; этот
+# случай покрывает invalidate_recipe_cache, потому что рецепт сохраняется
+# вместе с ними. Здесь — правки отдельных строк через ORM и удаление.
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipe_ingredients_cache(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(recipe_cache.invalidate_recipe, instance.recipe_id)
+    )
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def update_recipe_match_index(sender, instance, **kwargs):
+    # RecipeSerializer пишет ингредиенты через bulk_create, который
+    # сигналов не шлёт, но сам рецепт при этом сохраняется.
+    transaction.on_commit(
+        partial(recipe_match_index.mark_changed, instance.pk)
+    )
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def update_recipe_ingredients_match_index(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(recipe_match_index.mark_changed, instance.recipe_id)
+    )
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_author_cache(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    transaction.on_commit(recipe_cache.invalidate_all)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def invalidate_feed_cache(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(feed_cache.invalidate, instance.follower_id)
+    )
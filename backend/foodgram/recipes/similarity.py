@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from .matching import recipe_match_index
+from .models import Recipe, RecipeIngredient, SimilarRecipe
+
+# В маленьком каталоге доля max_df — единицы рецептов; отсекать
+# ингредиенты имеет смысл, только когда списки становятся длинными.
+MAX_DF_FLOOR = 100
+
+
+def column_weights(ingredients, recipe_count, max_df=None):
+    """Ингредиенты-столбцы, номер столбца каждой пары и вес IDF столбца.
+
+    Ингредиентам, которые есть больше чем в доле max_df рецептов (соль,
+    вода), достаётся вес 0: по IDF они почти ничего не весят, а в
+    произведении матриц связали бы каждый рецепт почти со всеми остальными.
+    """
+    if max_df is None:
+        max_df = settings.SIMILAR_RECIPES_MAX_DF
+    columns, column_index = np.unique(ingredients, return_inverse=True)
+    df = np.bincount(column_index, minlength=len(columns))
+    idf = np.log((1 + recipe_count) / (1 + df)) + 1
+    idf[df > max(max_df * recipe_count, MAX_DF_FLOOR)] = 0
+    return columns, column_index, idf
+
+
+def build_matrix(ingredients, positions, recipe_count, max_df=None):
+    """Разреженная матрица «рецепт × ингредиент» для косинусной близости.
+
+    Веса — IDF ингредиента из column_weights, строки нормированы, так что
+    близость двух рецептов — скалярное произведение строк.
+    """
+    columns, column_index, idf = column_weights(
+        ingredients, recipe_count, max_df
+    )
+    return weighted_matrix(column_index, positions, recipe_count, idf)
+
+
+def weighted_matrix(column_index, positions, recipe_count, idf):
+    keep = idf[column_index] > 0
+    matrix = sparse.csr_matrix(
+        (
+            idf[column_index[keep]],
+            (positions[keep], column_index[keep])
+        ),
+        shape=(recipe_count, len(idf)),
+        dtype=np.float32
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).astype(np.float32) @ matrix
+
+
+def best_neighbors(columns, scores, count):
+    """count соседей с наибольшей близостью, по убыванию близости."""
+    if len(scores) > count:
+        best = np.argpartition(-scores, count)[:count]
+        columns, scores = columns[best], scores[best]
+    order = np.lexsort((columns, -scores))
+    return columns[order], scores[order]
+
+
+def top_neighbors(matrix, rows, count):
+    """Для каждой строки из rows — count ближайших строк (номер, близость)."""
+    product = (matrix[rows] @ matrix.T).tocsr()
+    for offset, row in enumerate(rows):
+        start, end = product.indptr[offset], product.indptr[offset + 1]
+        columns = product.indices[start:end]
+        scores = product.data[start:end]
+        other = columns != row
+        yield row, *best_neighbors(columns[other], scores[other], count)
+
+
+def save_neighbors(recipe_ids, neighbors, batch_size=1000):
+    """Заменяет списки похожих для рецептов из neighbors.
+
+    neighbors — пары (номер строки, номера соседей, близости), номера
+    переводятся в id через recipe_ids. Возвращает число записанных строк.
+    """
+    saved = 0
+    batch_recipes = []
+    batch_rows = []
+
+    def flush():
+        nonlocal saved
+        # Рецепты, удалённые после сборки матрицы, нарушили бы внешний ключ.
+        existing = set(Recipe.objects.filter(
+            pk__in={row.similar_id for row in batch_rows} | set(batch_recipes)
+        ).values_list('pk', flat=True))
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=batch_recipes).delete()
+            saved += len(SimilarRecipe.objects.bulk_create(
+                [
+                    row for row in batch_rows
+                    if row.recipe_id in existing and row.similar_id in existing
+                ],
+                batch_size=batch_size,
+                ignore_conflicts=True
+            ))
+        batch_recipes.clear()
+        batch_rows.clear()
+
+    for row, columns, scores in neighbors:
+        recipe_id = int(recipe_ids[row])
+        batch_recipes.append(recipe_id)
+        batch_rows.extend(
+            SimilarRecipe(
+                recipe_id=recipe_id,
+                similar_id=int(recipe_ids[column]),
+                score=float(score)
+            )
+            for column, score in zip(columns, scores)
+            if score > 0
+        )
+        if len(batch_recipes) >= batch_size:
+            flush()
+    if batch_recipes:
+        flush()
+    return saved
+
+
+SimilarityModel = namedtuple(
+    'SimilarityModel', ('matrix', 'recipe_ids', 'columns', 'idf')
+)
+
+
+class SimilarityMatrix:
+    """Матрица близости, собранная из индекса RecipeMatchIndex.
+
+    Пересобирается раз в RECIPE_MATCH_INDEX_TTL секунд, а не после
+    каждого изменения индекса: пересчёт соседей одного рецепта — одно
+    произведение его строки, собранной по текущим ингредиентам, на
+    матрицу. Остальные рецепты в ней до пересборки остаются в том виде,
+    в каком были при сборке.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._model = None
+
+    def invalidate(self):
+        self._built_at = None
+
+    def _is_stale(self):
+        return (
+            self._built_at is None
+            or time.monotonic() - self._built_at
+            > settings.RECIPE_MATCH_INDEX_TTL
+        )
+
+    def get(self):
+        with self._lock:
+            if self._is_stale():
+                arrays = recipe_match_index.snapshot()
+                recipe_count = len(arrays.recipe_ids)
+                columns, column_index, idf = column_weights(
+                    arrays.ingredients, recipe_count
+                )
+                self._model = SimilarityModel(
+                    weighted_matrix(
+                        column_index, arrays.positions, recipe_count, idf
+                    ),
+                    arrays.recipe_ids, columns, idf
+                )
+                self._built_at = time.monotonic()
+            return self._model
+
+
+similarity_matrix = SimilarityMatrix()
+
+
+def update_similar_recipes(recipe_id):
+    """Пересчитывает список похожих для одного рецепта.
+
+    Списки других рецептов, в которые он теперь должен попасть,
+    обновит следующий запуск build_similar_recipes.
+    """
+    model = similarity_matrix.get()
+    ingredient_ids = np.unique(np.fromiter(
+        RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', flat=True),
+        dtype=np.int64
+    ))
+    # Ингредиенты, которых не было при сборке матрицы, ни с кем рецепт
+    # не связывают и в близость не входят.
+    found = np.searchsorted(model.columns, ingredient_ids)
+    found = found[found < len(model.columns)]
+    found = found[np.isin(model.columns[found], ingredient_ids)]
+    weights = model.idf[found]
+    if not weights.any():
+        SimilarRecipe.objects.filter(recipe_id=recipe_id).delete()
+        return
+    vector = sparse.csr_matrix(
+        (
+            weights / np.sqrt((weights ** 2).sum()),
+            (np.zeros(len(found), dtype=np.int32), found)
+        ),
+        shape=(1, len(model.columns)),
+        dtype=np.float32
+    )
+    product = (vector @ model.matrix.T).tocsr()
+    other = model.recipe_ids[product.indices] != recipe_id
+    columns, scores = best_neighbors(
+        product.indices[other], product.data[other],
+        settings.SIMILAR_RECIPES_COUNT
+    )
+    # Рецепта может не быть в матрице, поэтому его id дописывается
+    # отдельной строкой.
+    save_neighbors(
+        np.append(model.recipe_ids, recipe_id),
+        [(len(model.recipe_ids), columns, scores)]
+    )
@@ -0,0 +1,352 @@
+import shutil
+import tempfile
+from base64 import b64encode
+from io import BytesIO, StringIO
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.tasks import task_queue
+from recipes.autocomplete import ingredient_index
+from recipes.management.commands.check_query_budgets import ENDPOINTS
+from recipes.matching import recipe_match_index
+from recipes.models import (
+    FavoriteRecipe, IngredientModel, Recipe, RecipeIngredient, ShoppingCart,
+    SimilarRecipe
+)
+from recipes.pagination import RecipePagination
+from recipes.similarity import (
+    build_matrix, similarity_matrix, top_neighbors, update_similar_recipes
+)
+from users.models import Follow, User
+
+RECIPES_COUNT = 12
+
+
+@override_settings(RECIPE_CACHE_TIMEOUT=0, FEED_CACHE_TIMEOUT=0)
+class QueriesTestCase(TestCase):
+    """Читатель, три автора и рецепты в избранном, корзине и подписках."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Читатель', last_name='Тестов', password='pass12345'
+        )
+        authors = [
+            User.objects.create_user(
+                email=f'author{index}@foodgram.ru', username=f'author{index}',
+                first_name='Автор', last_name='Тестов', password='pass12345'
+            )
+            for index in range(3)
+        ]
+        ingredients = IngredientModel.objects.bulk_create(
+            IngredientModel(title=f'ингредиент {index}', measurement_unit='г')
+            for index in range(5)
+        )
+        for index in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                title=f'Рецепт {index}', description='Описание',
+                cooking_time=10, creator=authors[index % len(authors)],
+                picture='recipe_images/test.png'
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, quantity=index + 1
+                )
+                for ingredient in ingredients[:3]
+            )
+            if index % 2:
+                FavoriteRecipe.objects.create(owner=cls.reader, recipe=recipe)
+            if index % 3:
+                ShoppingCart.objects.create(owner=cls.reader, recipe=recipe)
+        Follow.objects.create(follower=cls.reader, following=authors[0])
+        cls.token = Token.objects.create(user=cls.reader)
+        cls.authors = authors
+        cls.author = authors[0]
+        cls.ingredient = ingredients[0]
+
+    def setUp(self):
+        # Индекс и кэш живут в процессе и переживают откат транзакции
+        # предыдущего теста.
+        cache.clear()
+        ingredient_index.invalidate()
+
+
+class RecipeListQueriesTest(QueriesTestCase):
+    """Число запросов списка рецептов не растёт с размером страницы."""
+
+    def assertListQueries(self, client, num):
+        for limit in (1, RECIPES_COUNT):
+            with self.assertNumQueries(num):
+                response = client.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), limit)
+
+    def test_anonymous_list(self):
+        self.assertListQueries(Client(), 6)
+
+    def test_authenticated_list(self):
+        self.assertListQueries(
+            Client(HTTP_AUTHORIZATION=f'Token {self.token.key}'), 9
+        )
+
+
+class IsSubscribedTest(QueriesTestCase):
+    """is_subscribed отвечает на всю страницу одним запросом."""
+
+    def setUp(self):
+        super().setUp()
+        Follow.objects.create(follower=self.reader, following=self.authors[1])
+        self.followed = {self.authors[0].pk, self.authors[1].pk}
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_users(self, url, limit):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url.format(limit=limit))
+        self.assertEqual(response.status_code, 200)
+        users = [
+            result.get('author', result)
+            for result in response.json()['results']
+        ]
+        return len(queries), {
+            user['id']: user['is_subscribed'] for user in users
+        }
+
+    def test_page_size_does_not_add_queries(self):
+        for url in ('/api/users/?limit={limit}',
+                    '/api/recipes/?limit={limit}',
+                    '/api/users/subscriptions/?limit={limit}'):
+            with self.subTest(url):
+                small, _ = self.get_users(url, 1)
+                large, subscribed = self.get_users(url, RECIPES_COUNT)
+                self.assertEqual(small, large)
+                self.assertEqual(
+                    subscribed,
+                    {pk: pk in self.followed for pk in subscribed}
+                )
+                self.assertGreater(len(subscribed), 0)
+
+
+@override_settings(
+    RECIPE_MATCH_SYNC_INTERVAL=3600, MEDIA_ROOT=tempfile.mkdtemp()
+)
+class RecipeMatchTest(QueriesTestCase):
+    """Рецепт, созданный через API, сразу находится по ингредиентам."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        recipe_match_index.invalidate()
+        token = Token.objects.create(user=self.author)
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.ingredients = list(
+            IngredientModel.objects.order_by('-pk')[:2]
+        )
+
+    def match(self):
+        response = self.client.post(
+            '/api/recipes/match/',
+            {'ingredients': [item.pk for item in self.ingredients]},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [result['id'] for result in response.json()['results']]
+
+    def test_created_recipe_matches_immediately(self):
+        self.assertEqual(self.match(), [])
+        output = BytesIO()
+        Image.new('RGB', (8, 8), 'red').save(output, 'PNG')
+        image = b64encode(output.getvalue()).decode()
+        # Варианты картинки и похожие рецепты здесь не нужны.
+        with mock.patch.object(task_queue, 'enqueue'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/recipes/',
+                {
+                    'name': 'Новый рецепт', 'text': 'Описание',
+                    'cooking_time': 5,
+                    'image': f'data:image/png;base64,{image}',
+                    'ingredients': [
+                        {'id': item.pk, 'amount': 1}
+                        for item in self.ingredients
+                    ],
+                },
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.match(), [response.json()['id']])
+
+
+@override_settings(RECIPE_CACHE_TIMEOUT=60)
+class RecipeCacheTest(QueriesTestCase):
+    """Кэш анонимной карточки сбрасывается при смене ингредиентов."""
+
+    def test_ingredients_update(self):
+        recipe = self.author.created_recipes.first()
+        url = f'/api/recipes/{recipe.pk}/'
+        self.assertEqual(len(Client().get(url).json()['ingredients']), 3)
+        token = Token.objects.create(user=self.author)
+        with mock.patch.object(task_queue, 'enqueue'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = Client(
+                HTTP_AUTHORIZATION=f'Token {token.key}'
+            ).patch(
+                url,
+                {'ingredients': [{'id': self.ingredient.pk, 'amount': 7}]},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            Client().get(url).json()['ingredients'],
+            [{
+                'id': self.ingredient.pk, 'name': self.ingredient.title,
+                'measurement_unit': 'г', 'amount': 7,
+            }]
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BuildImageVariantsTest(QueriesTestCase):
+    """Битые и отсутствующие картинки не останавливают обход."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_skips_broken_images(self):
+        valid, corrupt = self.author.created_recipes.all()[:2]
+        output = BytesIO()
+        Image.new('RGB', (8, 8), 'red').save(output, 'PNG')
+        valid.picture = default_storage.save(
+            'recipe_images/valid.png', ContentFile(output.getvalue())
+        )
+        valid.save(update_fields=['picture'])
+        corrupt.picture = default_storage.save(
+            'recipe_images/corrupt.png', ContentFile(b'not an image')
+        )
+        corrupt.save(update_fields=['picture'])
+        stdout, stderr = StringIO(), StringIO()
+        call_command('build_image_variants', stdout=stdout, stderr=stderr)
+        valid.refresh_from_db()
+        self.assertEqual(valid.picture_variants['source'], valid.picture.name)
+        self.assertIn('обработано 1', stdout.getvalue())
+        self.assertIn(
+            f'Не удалось обработать изображений: {RECIPES_COUNT - 1}',
+            stderr.getvalue()
+        )
+
+
+class RecipePaginationTest(QueriesTestCase):
+    """Размер страницы не больше RecipePagination.max_limit."""
+
+    def test_max_limit(self):
+        client = Client(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        for url in ('/api/recipes/', '/api/recipes/?cursor=',
+                    '/api/recipes/feed/'):
+            with self.subTest(url), mock.patch.object(
+                RecipePagination, 'max_limit', 2
+            ):
+                separator = '&' if '?' in url else '?'
+                response = client.get(f'{url}{separator}limit=100000')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), 2)
+
+
+class QueryBudgetTest(QueriesTestCase):
+    """Эндпоинты делают ровно столько запросов, сколько в ENDPOINTS."""
+
+    def test_budgets(self):
+        context = {
+            'author': self.author.pk,
+            'recipe': self.author.created_recipes.first().pk,
+            'ingredient': self.ingredient.pk,
+        }
+        for name, url, authenticated, budget in ENDPOINTS:
+            client = Client(HTTP_AUTHORIZATION=(
+                f'Token {self.token.key}' if authenticated else ''
+            ))
+            for limit in (1, RECIPES_COUNT):
+                with self.subTest(name, authenticated=authenticated,
+                                  limit=limit):
+                    cache.clear()
+                    ingredient_index.invalidate()
+                    with self.assertNumQueries(budget):
+                        response = client.get(
+                            url.format(limit=limit, **context)
+                        )
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                    self.assertEqual(response.status_code, 200)
+
+
+class SimilarRecipesTest(QueriesTestCase):
+    """Похожие рецепты одного рецепта и когда их пересчитывать."""
+
+    def setUp(self):
+        super().setUp()
+        recipe_match_index.invalidate()
+        similarity_matrix.invalidate()
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.recipe = self.author.created_recipes.first()
+
+    def test_non_numeric_pk(self):
+        response = self.client.get('/api/recipes/abc/similar/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_update_matches_full_build(self):
+        arrays = recipe_match_index.snapshot()
+        matrix = build_matrix(
+            arrays.ingredients, arrays.positions, len(arrays.recipe_ids)
+        )
+        row = int(np.searchsorted(arrays.recipe_ids, self.recipe.pk))
+        [(_, columns, scores)] = top_neighbors(matrix, [row], 10)
+        update_similar_recipes(self.recipe.pk)
+        self.assertEqual(
+            list(SimilarRecipe.objects.filter(
+                recipe=self.recipe
+            ).order_by('-score', 'similar_id').values_list(
+                'similar_id', flat=True
+            )),
+            [int(arrays.recipe_ids[column]) for column in columns]
+        )
+
+    def update_recipe(self, ingredients):
+        token = Token.objects.create(user=self.author)
+        client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        with mock.patch('recipes.views.task_queue') as queue:
+            response = client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {'ingredients': ingredients, 'cooking_time': 15},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        return queue.enqueue.call_count
+
+    def test_update_without_ingredient_changes(self):
+        ingredients = [
+            {'id': amount.ingredient_id, 'amount': amount.quantity + 1}
+            for amount in self.recipe.ingredient_amounts.all()
+        ]
+        self.assertEqual(self.update_recipe(ingredients), 0)
+
+    def test_update_with_ingredient_changes(self):
+        self.assertEqual(
+            self.update_recipe([{'id': self.ingredient.pk, 'amount': 1}]), 1
+        )
@@ -1,24 +1,45 @@
-from io import BytesIO
+from functools import partial
 
-from django.db.models import Sum
-from django.http import FileResponse
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Prefetch, Sum
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, permissions, filters, status, mixins, pagination
 from rest_framework.decorators import action
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from .filters import RecipeFilterSet
-from .models import IngredientModel, ShoppingCart, RecipeIngredient, FavoriteRecipe, Recipe
+from .autocomplete import ingredient_index
+from .cache import AnonymousCacheMixin
+from .feed import get_feed_positions
+from .filters import (
+    RANKED_ORDERINGS, RecipeFilterSet, RecipeOrderingFilter,
+    RecipeSearchFilter
+)
+from .matching import recipe_match_index
+from .models import (
+    IngredientModel, ShoppingCart, RecipeIngredient, FavoriteRecipe, Recipe,
+    RecipeScore, update_counter
+)
+from .pagination import RecipePagination
 from .permissions import CreatorOrReadOnly
+from .renderers import SHOPPING_LIST_RENDERERS
 from .serializers import (
     IngredientSerializer, RecipeSerializer, CompactRecipeSerializer, 
-    FollowingSerializer
+    FollowingSerializer, RecipeIdsSerializer, RecipeMatchSerializer,
+    get_recipes_limit
 )
+from .similarity import update_similar_recipes
+from api.metrics import (
+    RECIPES_CREATED, RECIPES_TOGGLED, SHOPPING_LISTS_DOWNLOADED
+)
+from api.mixins import ConditionalGetMixin, get_relations_state
+from api.tasks import task_queue
 from users.models import Follow, User
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = IngredientModel.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
@@ -27,157 +48,380 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ('title',)
     search_fields = ('^title',)
 
-    def get_queryset(self):
-        search_name = self.request.query_params.get('name')
-        if search_name:
-            return self.queryset.filter(title__istartswith=search_name.lower())
-        return self.queryset
+    def list(self, request, *args, **kwargs):
+        search_name = request.query_params.get('name')
+        if search_name is None:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer(
+            ingredient_index.search(search_name), many=True
+        )
+        return Response(serializer.data)
 
+    def get_list_version(self, request):
+        version = IngredientModel.objects.aggregate(
+            count=Count('id'), updated_at=Max('updated_at')
+        )
+        return tuple(version.values()), None
+
+    def get_object_version(self, request):
+        updated_at = IngredientModel.objects.filter(
+            pk=self.kwargs['pk']
+        ).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        return updated_at, updated_at
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(ConditionalGetMixin, AnonymousCacheMixin,
+                    viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = RecipePagination
     permission_classes = (CreatorOrReadOnly,)
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
-    search_fields = ('title',)
+    filter_backends = (
+        DjangoFilterBackend, RecipeSearchFilter, RecipeOrderingFilter
+    )
     filterset_fields = ('title',)
     filterset_class = RecipeFilterSet
 
     def get_queryset(self):
         return Recipe.objects.select_related('creator').prefetch_related(
-            'ingredient_amounts__ingredient',
-            'favorited_by',
-            'in_carts'
-        ).order_by('-publication_date')
+            'ingredient_amounts__ingredient'
+        ).defer('search_vector').with_user_flags(
+            self.request.user
+        ).order_by('-publication_date', '-id')
+
+    def get_relations_state(self, request):
+        return get_relations_state(
+            request.user,
+            (FavoriteRecipe, 'owner'),
+            (ShoppingCart, 'owner'),
+            (Follow, 'follower')
+        )
+
+    def get_list_version(self, request):
+        version = self.filter_queryset(Recipe.objects.all()).aggregate(
+            count=Count('id'),
+            updated_at=Max('updated_at'),
+            creator_updated_at=Max('creator__updated_at')
+        )
+        version.update(IngredientModel.objects.aggregate(
+            ingredients_updated_at=Max('updated_at')
+        ))
+        if request.query_params.get('ordering') in RANKED_ORDERINGS:
+            version.update(RecipeScore.objects.aggregate(
+                scores_refreshed_at=Max('refreshed_at')
+            ))
+        return (
+            (tuple(version.values()), self.get_relations_state(request)),
+            None
+        )
+
+    def get_object_version(self, request):
+        try:
+            version = Recipe.objects.filter(pk=self.kwargs['pk']).aggregate(
+                updated_at=Max('updated_at'),
+                creator_updated_at=Max('creator__updated_at'),
+                ingredients_updated_at=Max(
+                    'ingredient_amounts__ingredient__updated_at'
+                )
+            )
+        except (TypeError, ValueError):
+            return None
+        if version['updated_at'] is None:
+            return None
+        timestamps = [value for value in version.values() if value is not None]
+        return (
+            (tuple(version.values()), self.get_relations_state(request)),
+            max(timestamps)
+        )
 
     def perform_create(self, serializer):
-        serializer.save(creator=self.request.user)
+        with transaction.atomic():
+            recipe = serializer.save(creator=self.request.user)
+            task_queue.enqueue(update_similar_recipes, recipe.pk)
+            update_counter(
+                User.objects.filter(pk=self.request.user.pk),
+                'recipes_count', 1
+            )
+        RECIPES_CREATED.inc()
 
-    @action(
-        detail=True, 
-        methods=['post', 'delete'], 
-        url_path='shopping_cart',
-        permission_classes=[permissions.IsAuthenticated]
-    )
-    def manage_shopping_cart(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        current_user = request.user
-        
-        if not current_user.is_authenticated:
-            return Response(
-                {'error': 'Требуется аутентификация'},
-                status=status.HTTP_401_UNAUTHORIZED
+    def perform_update(self, serializer):
+        ingredients = RecipeIngredient.objects.filter(
+            recipe=serializer.instance
+        ).values_list('ingredient_id', flat=True)
+        with transaction.atomic():
+            before = set(ingredients.all())
+            serializer.save()
+            # Похожие зависят только от набора ингредиентов.
+            if set(ingredients.all()) != before:
+                task_queue.enqueue(
+                    update_similar_recipes, serializer.instance.pk
+                )
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            update_counter(
+                User.objects.filter(pk=instance.creator_id),
+                'recipes_count', -1
             )
 
+    def toggle_relation(self, request, pk, relation_model, counter_field,
+                        already_added_message, not_found_message):
+        current_user = request.user
+        recipes = Recipe.objects.filter(pk=pk)
+
         if request.method == 'POST':
-            cart_item, created = ShoppingCart.objects.get_or_create(
-                owner=current_user, recipe=recipe
+            recipe = get_object_or_404(
+                recipes.only(
+                    'id', 'title', 'picture', 'picture_variants',
+                    'cooking_time',
+                )
             )
-            if not created:
+            with transaction.atomic():
+                added = relation_model.objects.add(current_user, recipe)
+                if added:
+                    update_counter(recipes, counter_field, 1)
+            if not added:
                 return Response({
-                    'message': 'Рецепт уже находится в корзине!',
+                    'message': already_added_message,
                     'data': []
                 }, status=status.HTTP_400_BAD_REQUEST)
-            
-            recipe.save()
+            RECIPES_TOGGLED.labels(
+                relation_model._meta.model_name, 'add'
+            ).inc()
             serializer = CompactRecipeSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-            
-        elif request.method == 'DELETE':
-            deleted_count, _ = current_user.shopping_items.filter(recipe=recipe).delete()
 
-            if deleted_count == 0:
-                return Response(
-                    {'detail': 'Рецепт не найден в корзине!'},
-                    status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            removed = relation_model.objects.remove(current_user, pk)
+            if removed:
+                update_counter(recipes, counter_field, -1)
+        if not removed:
+            get_object_or_404(recipes)
+            return Response(
+                {'detail': not_found_message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        RECIPES_TOGGLED.labels(relation_model._meta.model_name, 'remove').inc()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def bulk_toggle_relation(self, request, relation_model, counter_field):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        current_user = request.user
+
+        found_ids = list(Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('pk', flat=True))
+
+        # Счётчики и статусы считаются только по строкам, которые вернул
+        # RETURNING: параллельный запрос с теми же id их не задвоит.
+        if request.method == 'POST':
+            statuses = ('added', 'already_added')
+            with transaction.atomic():
+                changed_ids = relation_model.objects.add_many(
+                    current_user, found_ids
+                )
+                update_counter(
+                    Recipe.objects.filter(pk__in=changed_ids), counter_field, 1
                 )
-            recipe.save()
-            return Response(status=status.HTTP_204_NO_CONTENT)
         else:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+            statuses = ('removed', 'not_added')
+            with transaction.atomic():
+                changed_ids = relation_model.objects.remove_many(
+                    current_user, found_ids
+                )
+                update_counter(
+                    Recipe.objects.filter(pk__in=changed_ids),
+                    counter_field, -1
+                )
+
+        RECIPES_TOGGLED.labels(
+            relation_model._meta.model_name,
+            'add' if request.method == 'POST' else 'remove'
+        ).inc(len(changed_ids))
+        found_ids = set(found_ids)
+        results = []
+        for recipe_id in recipe_ids:
+            if recipe_id not in found_ids:
+                result = 'not_found'
+            elif recipe_id in changed_ids:
+                result = statuses[0]
+            else:
+                result = statuses[1]
+            results.append({'id': recipe_id, 'status': result})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart/bulk',
+        url_name='shopping-cart-bulk',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def bulk_shopping_cart(self, request):
+        return self.bulk_toggle_relation(request, ShoppingCart, 'carts_count')
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite/bulk',
+        url_name='favorite-bulk',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def bulk_favorites(self, request):
+        return self.bulk_toggle_relation(
+            request, FavoriteRecipe, 'favorites_count'
+        )
+
+    @action(
+        detail=True,
+        methods=['post', 'delete'],
+        url_path='shopping_cart',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def manage_shopping_cart(self, request, pk=None):
+        return self.toggle_relation(
+            request, pk, ShoppingCart, 'carts_count',
+            'Рецепт уже находится в корзине!',
+            'Рецепт не найден в корзине!'
+        )
 
     @action(
         detail=False, 
         methods=['get'], 
         url_path='download_shopping_cart',
-        permission_classes=[permissions.IsAuthenticated]
+        permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=SHOPPING_LIST_RENDERERS
     )
     def export_shopping_list(self, request):
         current_user = request.user
-        cart_ingredients = RecipeIngredient.objects.filter(
-            recipe__in_carts__owner=current_user
-        ).values(
-            'ingredient__title',
-            'ingredient__unit'
-        ).annotate(
-            total_quantity=Sum('quantity')
-        ).order_by('ingredient__title')
-
-        if not cart_ingredients.exists():
+        if not current_user.shopping_items.exists():
             return Response({
                 'message': 'Корзина пуста',
                 'status': 'success'
             }, status=status.HTTP_200_OK)
 
-        file_buffer = BytesIO()
-        shopping_list = ''
-        for item in cart_ingredients:
-            shopping_list += (
-                f"{item['ingredient__title']} - "
-                f"{item['total_quantity']} "
-                f"{item['ingredient__unit']}\n"
-            )
-        file_buffer.write(shopping_list.encode('utf-8'))
-        file_buffer.seek(0)
-        
-        response = FileResponse(
-            file_buffer,
-            content_type='text/plain',
-            as_attachment=True,
-            filename='shopping_list.txt'
+        cart_ingredients = RecipeIngredient.objects.filter(
+            recipe__in_carts__owner=current_user
+        ).values(
+            name=F('ingredient__title'),
+            measurement_unit=F('ingredient__measurement_unit')
+        ).annotate(
+            amount=Sum('quantity')
+        ).order_by('name')
+
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(cart_ingredients.iterator()),
+            content_type=content_type
         )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
+        )
+        SHOPPING_LISTS_DOWNLOADED.labels(renderer.format).inc()
         return response
 
     @action(
-        detail=True, 
-        methods=['post', 'delete'], 
-        url_path='favorite',
+        detail=False,
+        methods=['get'],
+        url_path='feed',
         permission_classes=[permissions.IsAuthenticated]
     )
-    def manage_favorites(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        current_user = request.user
-        
-        if not current_user.is_authenticated:
-            return Response(
-                {'error': 'Требуется аутентификация'},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
+    def feed(self, request):
+        positions = self.paginator.paginate_positions(
+            request, partial(get_feed_positions, request.user)
+        )
+        recipes = self.get_queryset().in_bulk([pk for _, pk in positions])
+        serializer = self.get_serializer(
+            [recipes[pk] for _, pk in positions if pk in recipes], many=True
+        )
+        return self.get_paginated_response(serializer.data)
 
-        if request.method == 'POST':
-            favorite_item, created = FavoriteRecipe.objects.get_or_create(
-                owner=current_user, recipe=recipe
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='match',
+        permission_classes=[permissions.AllowAny]
+    )
+    def match(self, request):
+        serializer = RecipeMatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = Recipe.objects.only(
+            'id', 'title', 'picture', 'picture_variants', 'cooking_time'
+        )
+        matches = recipe_match_index.match(
+            serializer.validated_data['ingredients'],
+            serializer.validated_data['max_missing'],
+            serializer.validated_data['limit']
+        )
+        recipes = queryset.in_bulk([recipe_id for recipe_id, _, _ in matches])
+        deleted = [
+            recipe_id for recipe_id, _, _ in matches
+            if recipe_id not in recipes
+        ]
+        if deleted:
+            # Рецепты удалены в другом воркере: индекс выбросит их при
+            # синхронизации, а страница не окажется короче limit.
+            for recipe_id in deleted:
+                recipe_match_index.mark_changed(recipe_id)
+            matches = recipe_match_index.match(
+                serializer.validated_data['ingredients'],
+                serializer.validated_data['max_missing'],
+                serializer.validated_data['limit']
             )
-            if not created:
-                return Response({
-                    'message': 'Рецепт уже в избранном!',
-                    'data': []
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            recipe.save()
-            serializer = CompactRecipeSerializer(recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-            
-        elif request.method == 'DELETE':
-            deleted_count, _ = current_user.favorite_recipes.filter(recipe=recipe).delete()
-            if deleted_count == 0:
-                return Response({
-                    'detail': 'Рецепт не найден в избранном!'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            recipe.save()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        else:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+            recipes = queryset.in_bulk(
+                [recipe_id for recipe_id, _, _ in matches]
+            )
+        results = []
+        for recipe_id, coverage, missing in matches:
+            if recipe_id not in recipes:
+                continue
+            results.append({
+                **CompactRecipeSerializer(recipes[recipe_id]).data,
+                'coverage': round(coverage, 3),
+                'missing': missing,
+            })
+        return Response({'results': results})
+
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='similar',
+        permission_classes=[permissions.AllowAny]
+    )
+    def similar(self, request, pk=None):
+        get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        recipes = Recipe.objects.filter(similar_for__recipe_id=pk).only(
+            'id', 'title', 'picture', 'picture_variants', 'cooking_time'
+        ).annotate(
+            similarity=F('similar_for__score')
+        ).order_by('-similarity', 'id')[:settings.SIMILAR_RECIPES_COUNT]
+        return Response({'results': [
+            {
+                **CompactRecipeSerializer(recipe).data,
+                'similarity': round(recipe.similarity, 3),
+            }
+            for recipe in recipes
+        ]})
+
+    @action(
+        detail=True,
+        methods=['post', 'delete'],
+        url_path='favorite',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def manage_favorites(self, request, pk=None):
+        return self.toggle_relation(
+            request, pk, FavoriteRecipe, 'favorites_count',
+            'Рецепт уже в избранном!',
+            'Рецепт не найден в избранном!'
+        )
 
 
 class FollowingListViewSet(viewsets.GenericViewSet, mixins.ListModelMixin):
@@ -187,9 +431,24 @@ class FollowingListViewSet(viewsets.GenericViewSet, mixins.ListModelMixin):
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_queryset(self):
+        recipes = Recipe.objects.only(
+            'id', 'title', 'picture', 'picture_variants', 'cooking_time',
+            'creator'
+        ).order_by('-publication_date', '-id')
+        recipes_limit = get_recipes_limit(self.request)
+        if recipes_limit is not None:
+            # Срез в Prefetch Django выполняет через
+            # ROW_NUMBER() OVER (PARTITION BY creator_id ...), поэтому
+            # для каждого автора читается не больше recipes_limit строк.
+            recipes = recipes[:recipes_limit]
         return User.objects.filter(
             subscribers__follower=self.request.user
-        ).prefetch_related('created_recipes')
+        ).prefetch_related(
+            Prefetch(
+                'created_recipes', queryset=recipes,
+                to_attr='recipe_previews'
+            )
+        )
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -6,7 +6,10 @@ from .models import User, Follow
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff')
+    list_display = (
+        'username', 'email', 'first_name', 'last_name', 'is_staff',
+        'recipes_count'
+    )
     search_fields = ('username', 'email', 'first_name', 'last_name')
     list_filter = ('is_staff', 'is_superuser', 'is_active')
 
@@ -1,21 +1,51 @@
-import uuid
-from base64 import b64decode
-
-from django.core.files.base import ContentFile
 from djoser.serializers import UserSerializer, UserCreateSerializer
+from django.db import models
 from rest_framework import serializers
 
-from .models import User
+from .models import Follow, User
+from api.fields import ImageBase64Field
 import re
 
-class ImageBase64Field(serializers.ImageField):
-    def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format_part, image_string = data.split(';base64,')
-            extension = format_part.split('/')[-1]
-            file_name = f"user_avatar_{uuid.uuid4().hex[:8]}.{extension}"
-            data = ContentFile(b64decode(image_string), name=file_name)
-        return super().to_internal_value(data)
+
+def prime_subscriptions(context, users):
+    """Одним запросом узнаёт, на кого из users подписан автор запроса.
+
+    Результат копится в общем для вложенных сериализаторов context:
+    в subscriptions_checked — проверенные id, в subscriptions — те,
+    на кого есть подписка.
+    """
+    request = context.get('request')
+    if not request or not request.user.is_authenticated:
+        return
+    checked = context.setdefault('subscriptions_checked', set())
+    user_ids = {user.pk for user in users if user is not None} - checked
+    if not user_ids:
+        return
+    context.setdefault('subscriptions', set()).update(
+        Follow.objects.filter(
+            follower=request.user, following_id__in=user_ids
+        ).values_list('following_id', flat=True)
+    )
+    checked |= user_ids
+
+
+class SubscriptionsListSerializer(serializers.ListSerializer):
+    """Список, который заранее получает is_subscribed для всей страницы.
+
+    Пользователь берётся из элемента по атрибуту subscription_user_field
+    дочернего сериализатора (None — сам элемент), поэтому тот же класс
+    подходит и для списков пользователей, и для рецептов с авторами.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        items = list(data)
+        field = getattr(self.child, 'subscription_user_field', None)
+        prime_subscriptions(self.context, [
+            getattr(item, field) if field else item for item in items
+        ])
+        return super().to_representation(items)
 
 
 class UsersSerializer(UserSerializer):
@@ -23,7 +53,10 @@ class UsersSerializer(UserSerializer):
     avatar = ImageBase64Field(
         source='profile_picture',
         required=False, 
-        allow_null=True
+        allow_null=True,
+        file_prefix='user_avatar',
+        variant='thumbnail',
+        variants_field='avatar_variants'
     )
 
     class Meta(UserSerializer.Meta):
@@ -32,11 +65,14 @@ class UsersSerializer(UserSerializer):
             'id', 'email', 'username', 'first_name', 
             'last_name', 'is_subscribed', 'avatar'
         ]
+        list_serializer_class = SubscriptionsListSerializer
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if (not request or not request.user.is_authenticated or obj == request.user):
             return False
+        if obj.pk in self.context.get('subscriptions_checked', ()):
+            return obj.pk in self.context['subscriptions']
         return obj.subscribers.filter(follower=request.user).exists()
 
 
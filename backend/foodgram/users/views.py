@@ -1,18 +1,48 @@
+from django.db.models import Count, Max
 from djoser.views import UserViewSet
 from rest_framework import status, permissions, pagination
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .models import User
+from .models import Follow, User
 from .serializers import UsersSerializer
+from api.mixins import ConditionalGetMixin, get_relations_state
 
 
-class UserViewSet(UserViewSet):
+class UserViewSet(ConditionalGetMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = UsersSerializer
     pagination_class = pagination.LimitOffsetPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_list_version(self, request):
+        version = self.get_queryset().aggregate(
+            count=Count('id'), updated_at=Max('updated_at')
+        )
+        return (
+            (tuple(version.values()),
+             get_relations_state(request.user, (Follow, 'follower'))),
+            None
+        )
+
+    def get_object_version(self, request):
+        lookup = self.kwargs.get(self.lookup_field)
+        if lookup is None:
+            return None
+        try:
+            updated_at = self.get_queryset().filter(
+                **{self.lookup_field: lookup}
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            return None
+        if updated_at is None:
+            return None
+        return (
+            (updated_at,
+             get_relations_state(request.user, (Follow, 'follower'))),
+            updated_at
+        )
+
     @action(
         detail=False, 
         methods=['get'], 